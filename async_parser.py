@@ -0,0 +1,250 @@
+import asyncio
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+from exceptions import BadAddressError
+from models.filter_models import FilterParams
+from models.models import FlatInfo, Tender, TenderBuilder
+from parser import ParserBase, ParserRequests
+from utils.async_utils import (
+    AsyncDecodeTo,
+    AsyncHostLimiter,
+    AsyncInFlightCache,
+    async_get_url,
+)
+from utils.utils import HTTPMethod
+from logger import log
+
+
+class AsyncParserRequests:
+    URL_FLATINFO = ParserRequests.URL_FLATINFO
+    URL_INVEST = ParserRequests.URL_INVEST
+    URL_TENDER = ParserRequests.URL_TENDER
+
+    def __init__(
+            self,
+            host_limits: Optional[Dict[str, int]] = None,
+            session: Optional[aiohttp.ClientSession] = None,
+            host_rates: Optional[Dict[str, float]] = None,
+    ):
+        self.host_limiter = AsyncHostLimiter(host_limits, rates=host_rates)
+        self.session = session
+
+    async def get_page_invest(self, params: dict) -> dict:
+        res = await async_get_url(
+            self.session,
+            HTTPMethod.POST,
+            AsyncDecodeTo.JSON,
+            self.URL_INVEST,
+            json=params,
+            throttle=self.host_limiter.get_throttle(self.URL_INVEST),
+        )
+        return res
+
+    async def get_deposit_invest(self, params: dict) -> dict:
+        res = await async_get_url(
+            self.session,
+            HTTPMethod.GET,
+            AsyncDecodeTo.JSON,
+            self.URL_TENDER,
+            params=params,
+            throttle=self.host_limiter.get_throttle(self.URL_TENDER),
+        )
+        return res
+
+    async def get_url_flatinfo(self, params: dict) -> dict:
+        res = await async_get_url(
+            self.session,
+            HTTPMethod.GET,
+            AsyncDecodeTo.JSON,
+            self.URL_FLATINFO,
+            params=params,
+            throttle=self.host_limiter.get_throttle(self.URL_FLATINFO),
+        )
+        return res
+
+    async def get_page_flatinfo(self, url: str) -> str:
+        res = await async_get_url(
+            self.session,
+            HTTPMethod.GET,
+            AsyncDecodeTo.TEXT,
+            url,
+            throttle=self.host_limiter.get_throttle(url),
+        )
+        return res
+
+
+class AsyncParser(ParserBase, AsyncParserRequests):
+    def __init__(
+            self,
+            workers: int = 16,
+            host_limits: Optional[Dict[str, int]] = None,
+            session: Optional[aiohttp.ClientSession] = None,
+            host_rates: Optional[Dict[str, float]] = None,
+            page_workers: int = 4,
+    ):
+        """
+        workers - количество тендеров, обогащаемых одновременно
+        page_workers - количество страниц, загружаемых одновременно
+        session - внешняя сессия aiohttp, иначе создается на время run
+        host_rates - максимальная частота запросов к хостам (в секунду),
+        как у Parser
+        """
+        super().__init__(host_limits, session, host_rates)
+        self.workers = workers
+        self.page_workers = page_workers
+        self.params = None
+        self.address_cache = AsyncInFlightCache()
+        self.url_cache = AsyncInFlightCache()
+
+    async def run(self, params: FilterParams) -> List[Tender]:
+        return [tender async for tender in self.iter_tenders(params)]
+
+    async def iter_tenders(self, params: FilterParams) -> AsyncIterator[Tender]:
+        own_session = self.session is None
+        if own_session:
+            self.session = aiohttp.ClientSession()
+
+        try:
+            async for tender in self._iter_tenders(params):
+                yield tender
+        finally:
+            if own_session:
+                await self.session.close()
+                self.session = None
+
+    async def _iter_tenders(self, params: FilterParams) -> AsyncIterator[Tender]:
+        # Размер страницы задается в get_page_params на копии параметров
+        self.params: FilterParams = params
+        self.address_cache = AsyncInFlightCache()
+        self.url_cache = AsyncInFlightCache()
+        workers = asyncio.Semaphore(self.workers)
+
+        first_page = await self._get_page_data(1)
+        # Очередь ограничена, поэтому страницы не загружаются и тендеры
+        # не обогащаются сильно впереди потребителя
+        queue = asyncio.Queue(maxsize=self.workers)
+
+        async def construct(tender):
+            async with workers:
+                return await self.construct_tender(tender)
+
+        async def produce():
+            pages = self.iter_pages(first_page)
+            try:
+                async for page in pages:
+                    for tender in self.clear_entities(page):
+                        await queue.put(asyncio.ensure_future(construct(tender)))
+            except Exception:
+                await queue.put(None)
+                raise
+            finally:
+                await pages.aclose()
+            await queue.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                task = await queue.get()
+                if task is None:
+                    break
+                tender = await task
+                if tender is not None:
+                    yield tender
+            # Ошибка загрузки страниц поднимается здесь
+            await producer
+        finally:
+            producer.cancel()
+            while not queue.empty():
+                task = queue.get_nowait()
+                if task is not None:
+                    task.cancel()
+
+    async def iter_pages(self, first_page: dict) -> AsyncIterator[dict]:
+        """
+        Отдает страницы выдачи. Первая страница уже загружена, остальные
+        загружаются параллельно с ограниченным окном, как в Parser.iter_pages
+        """
+        end_page_number = self.get_end_page_number(first_page['totalCount'])
+        page_numbers = iter(range(2, end_page_number))
+        window = max(self.page_workers, 1) * 2
+
+        pages = deque(
+            asyncio.ensure_future(self._get_page_data(page_number))
+            for page_number in islice(page_numbers, window)
+        )
+        try:
+            yield first_page
+            while pages:
+                page = await pages.popleft()
+                for next_number in islice(page_numbers, 1):
+                    pages.append(
+                        asyncio.ensure_future(self._get_page_data(next_number))
+                    )
+                yield page
+        finally:
+            for task in pages:
+                task.cancel()
+
+    async def _get_page_data(self, page_number: int) -> dict:
+        params = self.get_page_params(page_number, self.PAGE_SIZE)
+        res = await self.get_page_invest(params)
+        return res
+
+    async def _get_tender_detail(self, tender_id: int) -> dict:
+        params = {
+            "tenderId": tender_id
+        }
+        res = await self.get_deposit_invest(params)
+        return res
+
+    async def get_url_by_address(self, address: str) -> str:
+        params = {
+            'term': address
+        }
+        res = await self.get_url_flatinfo(params)
+        url = res.get('url')
+        if url:
+            return url
+        else:
+            raise BadAddressError(address)
+
+    async def construct_tender(self, invest) -> Optional[Tender]:
+        try:
+            invest_info = self.parse_invest(invest)
+
+            tender_detail, flat_info = await asyncio.gather(
+                self._get_tender_detail(invest_info.id),
+                self.get_flatinfo(invest_info.clean_address),
+            )
+            invest_info.deposit = self.get_deposit(tender_detail)
+
+            tender_obj = TenderBuilder.build(flat_info, invest_info)
+            return tender_obj
+        except (Exception,) as e:
+            self.metrics.inc('tenders_dropped_total', reason=type(e).__name__)
+            log.debug(f'Тендер {invest.get("id")} пропущен: {e!r}')
+            return
+
+    async def get_flatinfo(self, address: str) -> FlatInfo:
+        async def load():
+            url = await self.get_url_by_address(address)
+            return await self.get_flatinfo_by_url(url)
+
+        try:
+            flat_info = await self.address_cache.get_or_compute(address, load)
+        except BadAddressError:
+            log.error('Ошибка получения flatinfo.')
+            flat_info = FlatInfo()
+
+        return flat_info
+
+    async def get_flatinfo_by_url(self, url: str) -> FlatInfo:
+        async def load():
+            text_page = await self.get_page_flatinfo(url)
+            return self.parse_flatinfo(text_page, url)
+
+        return await self.url_cache.get_or_compute(url, load)
@@ -0,0 +1,100 @@
+"""
+Бенчмарк разбора страницы выдачи: json/orjson и parse_obj/from_raw.
+
+На синтетической странице:
+    python -m benchmarks.bench_ingest --tenders 100 --repeat 200
+
+На записанной странице searchTenderObjects из архива bench_parser:
+    python -m benchmarks.bench_ingest --page bench_archive/<key>.json
+"""
+import argparse
+import json
+import time
+
+from models.models import InvestInfo
+from utils.utils import json_loads, orjson
+
+
+def make_tender(index: int) -> dict:
+    return {
+        'id': index,
+        'url': f'/tenders/{index}',
+        'objectTypeName': 'Квартира',
+        'objectArea': 42.5,
+        'isIoAreaInHectars': False,
+        'address': f'г. Москва, ул. Ленина, д. {index}, кв. 7',
+        'startPrice': 10_000_000,
+        'pricePerSquare': 235_000,
+        'floors': 17,
+        'roomFloors': [5],
+        'roomsCount': 2,
+        'requestEndDate': '2023-08-01T10:00:00',
+        'tenderDate': '2023-08-05T10:00:00',
+        'attachedPics': [{'url': f'/pics/{index}.jpg'}],
+    }
+
+
+def make_page(count: int) -> bytes:
+    page = {
+        'totalCount': count,
+        'entities': [{'tenders': [make_tender(i) for i in range(count)]}],
+    }
+    return json.dumps(page, ensure_ascii=False).encode('utf-8')
+
+
+def load_page(path: str) -> bytes:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['body'].encode('utf-8')
+
+
+def get_tenders(page: dict) -> list:
+    return [
+        tender
+        for entity in page.get('entities') or []
+        for tender in entity.get('tenders') or []
+    ]
+
+
+def measure(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк разбора выдачи')
+    arg_parser.add_argument('--page', default=None,
+                            help='файл ответа из архива HttpArchive')
+    arg_parser.add_argument('--tenders', type=int, default=100,
+                            help='тендеров на синтетической странице')
+    arg_parser.add_argument('--repeat', type=int, default=200)
+    return arg_parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    content = load_page(args.page) if args.page else make_page(args.tenders)
+    tenders = get_tenders(json_loads(content))
+
+    results = {
+        'json.loads': measure(lambda: json.loads(content), args.repeat),
+        'parse_obj': measure(
+            lambda: [InvestInfo.parse_obj(t) for t in tenders], args.repeat
+        ),
+        'from_raw': measure(
+            lambda: [InvestInfo.from_raw(t) for t in tenders], args.repeat
+        ),
+    }
+    if orjson is not None:
+        results['orjson.loads'] = measure(
+            lambda: orjson.loads(content), args.repeat
+        )
+
+    print(f'тендеров на странице: {len(tenders)}')
+    for name, seconds in results.items():
+        print(f'{name:>14}: {seconds * 1000:.3f} мс/страница')
+
+
+if __name__ == '__main__':
+    main()
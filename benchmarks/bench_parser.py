@@ -0,0 +1,168 @@
+"""
+Сквозной бенчмарк Parser.run на записанных ответах.
+
+Запись архива (реальные запросы):
+    python -m benchmarks.bench_parser --archive bench_archive --record URL
+
+Прогон по архиву:
+    python -m benchmarks.bench_parser --archive bench_archive URL \
+        --latency 0.05 --error-rate 0.01 --workers 8
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+from typing import Dict
+
+from models.filter_models import parse_url
+from parser import Parser
+from utils.metrics import Metrics
+from utils.replay import HttpArchive, RecordingSession, ReplaySession
+from utils.session import SessionPool
+
+# Этапы парсера, по которым считаются перцентили
+STAGES = ('page', 'construct_tender', 'deposit', 'flatinfo_parse')
+
+
+def get_peak_rss_mb() -> float:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak_rss / 1024 / 1024
+    return peak_rss / 1024
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк Parser.run')
+    arg_parser.add_argument('urls', nargs='+', help='ссылки с фильтрами')
+    arg_parser.add_argument('--archive', required=True, help='каталог архива')
+    arg_parser.add_argument('--record', action='store_true',
+                            help='записать архив реальными запросами')
+    arg_parser.add_argument('--latency', type=float, default=0.0)
+    arg_parser.add_argument('--jitter', type=float, default=0.0)
+    arg_parser.add_argument('--error-rate', type=float, default=0.0)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--workers', type=int, default=1)
+    arg_parser.add_argument('--page-workers', type=int, default=4)
+    arg_parser.add_argument('--page-size', default='10')
+    arg_parser.add_argument('--processes', type=int, default=0)
+    arg_parser.add_argument('--host-rate', type=float, default=None,
+                            help='частота запросов к каждому хосту')
+    arg_parser.add_argument('--json', action='store_true',
+                            help='вывести отчет в json')
+    arg_parser.add_argument('--metrics-out', default=None,
+                            help='сохранить json-отчет метрик парсера')
+    return arg_parser.parse_args()
+
+
+def get_percentiles(metrics: Metrics, name: str, label: str) -> Dict:
+    """
+    count, p50 и p99 гистограммы name по значениям метки label, мс
+    """
+    result = {}
+    for labels, histogram in metrics.get_histograms(name).items():
+        result[dict(labels)[label]] = {
+            'count': histogram.count,
+            'p50_ms': round(histogram.percentile(50) * 1000, 2),
+            'p99_ms': round(histogram.percentile(99) * 1000, 2),
+        }
+    return dict(sorted(result.items()))
+
+
+def run_benchmark(args, metrics: Metrics) -> Dict:
+    archive = HttpArchive(args.archive)
+    if args.record:
+        def session_factory():
+            return RecordingSession(archive)
+    else:
+        replay_sessions = []
+
+        def session_factory():
+            session = ReplaySession(
+                archive,
+                latency=args.latency,
+                jitter=args.jitter,
+                error_rate=args.error_rate,
+                seed=args.seed,
+            )
+            replay_sessions.append(session)
+            return session
+
+    host_rates = None
+    if args.host_rate:
+        host_rates = {
+            'api.investmoscow.ru': args.host_rate,
+            'flatinfo.ru': args.host_rate,
+        }
+    page_size = args.page_size if args.page_size == 'auto' \
+        else int(args.page_size)
+
+    tenders_count = 0
+    start = time.perf_counter()
+    with SessionPool(session_factory=session_factory) as sessions:
+        for url in args.urls:
+            params = parse_url(url)
+            with Parser(
+                    workers=args.workers,
+                    host_rates=host_rates,
+                    sessions=sessions,
+                    page_size=page_size,
+                    page_workers=args.page_workers,
+                    processes=args.processes,
+                    metrics=metrics,
+            ) as parser:
+                tenders_count += len(parser.run(params))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'tenders': tenders_count,
+        'seconds': round(elapsed, 3),
+        'tenders_per_second': round(tenders_count / elapsed, 2),
+        'peak_rss_mb': round(get_peak_rss_mb(), 1),
+    }
+    if args.record:
+        return report
+
+    report['requests'] = sum(s.requests_count for s in replay_sessions)
+    report['injected_errors'] = sum(s.errors_count for s in replay_sessions)
+    # Время этапов замеряет сам парсер, задержка запросов включает
+    # имитируемую latency
+    stages = get_percentiles(metrics, 'stage_seconds', 'stage')
+    report['stages'] = {
+        stage: stages[stage] for stage in STAGES if stage in stages
+    }
+    report['requests_latency'] = get_percentiles(
+        metrics,
+        'http_request_seconds',
+        'endpoint',
+    )
+    return report
+
+
+def print_report(report: Dict) -> None:
+    sections = ('stages', 'requests_latency')
+    for key, value in report.items():
+        if key not in sections:
+            print(f'{key:>20}: {value}')
+
+    for section in sections:
+        if section not in report:
+            continue
+        print(f'\n{section}:')
+        for name, stage in report[section].items():
+            print(
+                f'{name:>30}: {stage["count"]:>6}, '
+                f'p50 {stage["p50_ms"]} ms, p99 {stage["p99_ms"]} ms'
+            )
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    metrics = Metrics(keep_samples=True)
+    report = run_benchmark(args, metrics)
+    if args.metrics_out:
+        metrics.write_report(args.metrics_out)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
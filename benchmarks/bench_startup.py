@@ -0,0 +1,88 @@
+"""
+Время запуска: импорт модулей парсера и `main.py --help` в отдельных
+процессах. Завершается с кодом 1, если медиана превышает бюджет.
+
+    python -m benchmarks.bench_startup --repeat 10 --budget-ms 400
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = {
+    'import parser': [sys.executable, '-c', 'import parser'],
+    'main.py --help': [sys.executable, 'main.py', '--help'],
+}
+# Модули, которые не должны загружаться при импорте парсера
+LAZY_MODULES = ('bs4', 'lxml', 'pyarrow')
+IMPORT_TIME_RE = re.compile(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def measure(command: List[str], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def get_import_times(module: str) -> Dict[str, float]:
+    """
+    Кумулятивное время импорта модулей первых двух уровней, мс
+    """
+    res = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for match in IMPORT_TIME_RE.finditer(res.stderr):
+        cumulative, indent, name = match.groups()
+        if len(indent) <= 2:
+            times[name] = int(cumulative) / 1000
+    return times
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк времени запуска')
+    arg_parser.add_argument('--repeat', type=int, default=10)
+    arg_parser.add_argument('--budget-ms', type=float, default=400,
+                            help='допустимая медиана каждой команды')
+    arg_parser.add_argument('--top', type=int, default=10,
+                            help='сколько самых долгих импортов показать')
+    return arg_parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    over_budget = False
+
+    for name, command in COMMANDS.items():
+        seconds = measure(command, args.repeat)
+        status = 'ok' if seconds * 1000 <= args.budget_ms else 'OVER BUDGET'
+        over_budget |= status != 'ok'
+        print(f'{name:>16}: {seconds * 1000:.1f} мс ({status})')
+
+    import_times = get_import_times('parser')
+    print('\nсамые долгие импорты parser, мс:')
+    for name, ms in sorted(import_times.items(), key=lambda x: -x[1])[:args.top]:
+        print(f'{name:>32}: {ms:.1f}')
+
+    loaded = [name for name in LAZY_MODULES if name in import_times]
+    if loaded:
+        over_budget = True
+        print(f'\nзагружены при импорте: {", ".join(loaded)}')
+
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,21 @@
 class TooManyRequestsError(Exception):
-    pass
+    def __init__(self, retry_after=None):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
 
 
 class BadAddressError(Exception):
     pass
+
+
+class ReplayMissError(LookupError):
+    pass
+
+
+class UnknownFilterValueError(ValueError):
+    def __init__(self, errors):
+        """
+        errors - {имя фильтра: [неизвестные значения]}
+        """
+        super().__init__(errors)
+        self.errors = errors
@@ -1,9 +1,18 @@
 from loguru import logger as log
 
-log.add(
-    "loggs.log",
-    format='{time} | {level} | {message}',
-    rotation="10 MB",
-    compression="zip",
-    encoding='utf-8'
-)
+LOG_PATH = 'loggs.log'
+
+
+def setup_logging(path: str = LOG_PATH, level: str = 'DEBUG') -> None:
+    """
+    Добавляет файловый лог. Вызывается точкой входа, при импорте
+    модулей парсера файл лога не создается
+    """
+    log.add(
+        path,
+        level=level,
+        format='{time} | {level} | {message}',
+        rotation="10 MB",
+        compression="zip",
+        encoding='utf-8'
+    )
@@ -1,14 +1,107 @@
-from models.filter_models import parse_url
-from parser import Parser
+"""
+Запуск парсера из командной строки:
 
-if __name__ == '__main__':
-    url = 'https://investmoscow.ru/tenders?pageNumber=1&pageSize=10&orderBy=RequestEndDate&orderAsc=true&objectTypes=nsi:41:30011568&objectTypes=nsi:41:30011566&objectKinds=nsi:tender_type_portal:13&price.min=1900000&price.max=2000000&tenderStatus=nsi:tender_status_tender_filter:1&objectForms=nsi:45:45001'
-    params = parse_url(url)
+    python main.py "URL" -o tenders.csv --workers 8 --cache flatinfo_cache.sqlite
+    python main.py --urls-file urls.txt -o tenders.parquet
+
+Модули парсера импортируются только после разбора аргументов,
+поэтому --help и ошибки в аргументах не платят за импорт.
+"""
+import argparse
+import sys
+from typing import List
+
+PAGE_SIZE_AUTO = 'auto'
+
+
+def page_size_type(value: str):
+    return value if value == PAGE_SIZE_AUTO else int(value)
+
+
+def parse_args(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Парсер тендеров investmoscow')
+    arg_parser.add_argument('urls', nargs='*', help='ссылки с фильтрами')
+    arg_parser.add_argument('--urls-file', default=None,
+                            help='файл со ссылками, по одной в строке')
+    arg_parser.add_argument('-o', '--output', default=None,
+                            help='файл результата: .jsonl, .csv или .parquet, '
+                                 'без него тендеры выводятся в консоль')
+    arg_parser.add_argument('--workers', type=int, default=8,
+                            help='потоки обогащения тендеров')
+    arg_parser.add_argument('--page-workers', type=int, default=4)
+    arg_parser.add_argument('--page-size', type=page_size_type, default=10,
+                            help="размер страницы или 'auto'")
+    arg_parser.add_argument('--processes', type=int, default=0,
+                            help='процессы для разбора html')
+    arg_parser.add_argument('--deposits', default='eager',
+                            choices=('eager', 'skip'))
+    arg_parser.add_argument('--cache', default=None,
+                            help='файл постоянного кэша flatinfo')
+    arg_parser.add_argument('--cache-ttl-days', type=float, default=30)
+    arg_parser.add_argument('--log-file', default='loggs.log')
+    arg_parser.add_argument('--log-level', default='DEBUG')
+    return arg_parser.parse_args(argv)
+
+
+def read_urls(args) -> List[str]:
+    urls = list(args.urls)
+    if args.urls_file:
+        with open(args.urls_file, encoding='utf-8') as f:
+            urls.extend(line.strip() for line in f if line.strip())
+    return urls
 
-    parser = Parser()
-    tenders = parser.run(params)
 
-    for tender in tenders:
-        print(tender)
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    urls = read_urls(args)
+    if not urls:
+        print('Не заданы ссылки с фильтрами', file=sys.stderr)
+        return 2
 
-    print('Всего: ', len(tenders))
+    from logger import setup_logging
+    from models.filter_models import parse_url
+    from parser import Parser
+    from utils.cache import SqliteCache
+    from utils.export import export_tenders
+
+    setup_logging(args.log_file, args.log_level)
+
+    cache = None
+    if args.cache:
+        cache = SqliteCache(args.cache, ttl=args.cache_ttl_days * 24 * 60 * 60)
+
+    params_list = [parse_url(url) for url in urls]
+    with Parser(
+            workers=args.workers,
+            page_workers=args.page_workers,
+            page_size=args.page_size,
+            processes=args.processes,
+            deposits=args.deposits,
+            cache=cache,
+    ) as parser:
+        if len(params_list) == 1:
+            tenders = parser.iter_tenders(params_list[0])
+        else:
+            unique_tenders = {}
+            for result in parser.run_many(params_list):
+                for tender in result:
+                    unique_tenders.setdefault(tender.idx, tender)
+            tenders = unique_tenders.values()
+
+        if args.output:
+            count = export_tenders(tenders, args.output)
+        else:
+            count = 0
+            for tender in tenders:
+                print(tender)
+                count += 1
+
+    if cache is not None:
+        cache.close()
+
+    print('Всего: ', count)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
 
 import requests
 from pydantic import BaseModel
 
+from exceptions import UnknownFilterValueError
+
+FILTERS_URL = 'https://api.investmoscow.ru/investmoscow/tender/v2/filtered-tenders/metadata?filterDisplay=Tender'
+FILTERS_CACHE_PATH = 'filters_metadata.json'
+FILTERS_MAX_AGE = 24 * 60 * 60
+
 
 class Value(BaseModel):
     id: Optional[int] = None
@@ -40,10 +49,157 @@ class Model(BaseModel):
     groupCodes: List[GroupCode]
 
 
-def get_filters():
-    url = 'https://api.investmoscow.ru/investmoscow/tender/v2/filtered-tenders/metadata?filterDisplay=Tender'
-    res = requests.get(url)
-    return Model.parse_obj(res.json())
+def load_filters_cache(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def save_filters_cache(path: str, entry: dict) -> None:
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(f'{path}.tmp', path)
+
+
+def get_filters(
+        cache_path: Optional[str] = FILTERS_CACHE_PATH,
+        max_age: float = FILTERS_MAX_AGE,
+        session: Optional[requests.Session] = None,
+) -> Model:
+    """
+    Метаданные фильтров с локальным кэшем. Кэш моложе max_age секунд
+    используется без запроса, иначе метаданные перепроверяются по
+    ETag/Last-Modified. Если API недоступен, отдается старый кэш.
+    cache_path=None - всегда загружать заново
+    """
+    client = session or requests
+    entry = load_filters_cache(cache_path) if cache_path else None
+    if entry is not None and time.time() - entry['fetched_at'] < max_age:
+        return Model.parse_obj(entry['data'])
+
+    headers = {}
+    if entry is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        res = client.get(FILTERS_URL, headers=headers)
+        if res.status_code != 304:
+            res.raise_for_status()
+    except requests.RequestException:
+        if entry is None:
+            raise
+        return Model.parse_obj(entry['data'])
+
+    if res.status_code == 304:
+        entry['fetched_at'] = time.time()
+    else:
+        entry = {
+            'etag': res.headers.get('ETag'),
+            'last_modified': res.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'data': res.json(),
+        }
+
+    if cache_path:
+        save_filters_cache(cache_path, entry)
+    return Model.parse_obj(entry['data'])
+
+
+def normalize_label(label: str) -> str:
+    return ' '.join(label.lower().replace('ё', 'е').split())
+
+
+class FilterIndex:
+    """
+    Справочник значений фильтров из метаданных: код -> название
+    и название -> код. Имена фильтров совпадают с алиасами FilterParams
+    (objectTypes, districts, subwayStations, ...)
+    """
+
+    def __init__(self, model: Model):
+        self.model = model
+        self.labels: Dict[str, Dict[str, str]] = {}
+        self.codes: Dict[str, Dict[str, str]] = {}
+        for filter_ in model.filters:
+            if not filter_.values:
+                continue
+            self.labels[filter_.name] = {
+                value.code: value.value for value in filter_.values
+            }
+            self.codes[filter_.name] = {
+                normalize_label(value.value): value.code
+                for value in filter_.values
+            }
+
+    @classmethod
+    def load(cls, **kwargs) -> FilterIndex:
+        """
+        Справочник по метаданным из get_filters(**kwargs)
+        """
+        return cls(get_filters(**kwargs))
+
+    def get_label(self, filter_name: str, code: str) -> Optional[str]:
+        return self.labels.get(filter_name, {}).get(code)
+
+    def get_code(self, filter_name: str, label: str) -> Optional[str]:
+        return self.codes.get(filter_name, {}).get(normalize_label(label))
+
+    def get_checked_values(self, params) -> Dict[str, List[str]]:
+        """
+        Значения FilterParams, которые есть в справочнике: алиас -> значения
+        """
+        values = {}
+        for name, value in params.dict(by_alias=True, exclude_none=True).items():
+            if name not in self.labels:
+                continue
+            values[name] = [value] if isinstance(value, str) else list(value)
+        return values
+
+    def validate(self, params) -> None:
+        """
+        Проверяет коды FilterParams до загрузки выдачи
+        """
+        errors = {}
+        for name, values in self.get_checked_values(params).items():
+            unknown = [value for value in values if value not in self.labels[name]]
+            if unknown:
+                errors[name] = unknown
+        if errors:
+            raise UnknownFilterValueError(errors)
+
+    def expand(self, filter_name: str, values: Iterable[str]) -> List[str]:
+        """
+        Заменяет названия ('Квартира', названия районов) на коды,
+        коды и неизвестные значения остаются как есть
+        """
+        labels = self.labels.get(filter_name, {})
+        return [
+            value if value in labels
+            else self.get_code(filter_name, value) or value
+            for value in values
+        ]
+
+    def expand_params(self, params):
+        """
+        Копия FilterParams с названиями, замененными на коды, и проверкой
+        """
+        fields = {field.alias: field for field in params.__fields__.values()}
+        update = {}
+        for name, values in self.get_checked_values(params).items():
+            field = fields[name]
+            codes = self.expand(name, values)
+            update[field.name] = codes[0] if field.outer_type_ is str else codes
+
+        params = params.copy(update=update)
+        self.validate(params)
+        return params
 
 
 if __name__ == '__main__':
@@ -81,8 +81,7 @@ def parse_url(url):
             res_converted[key] = True
 
         elif query_dict[key][0] == 'false':
-            query_dict[key] = False
-            res_converted[key] = query_dict[key][0]
+            res_converted[key] = False
 
         elif key in SINGLE_FIELDS:
             res_converted[key] = value[0]
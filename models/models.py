@@ -1,14 +1,39 @@
 from __future__ import annotations
 
+import sys
 from datetime import datetime, timedelta
 from typing import Optional, List
 
 from camelsnake import snake_to_camel
 from pydantic import BaseModel, validator
+from pydantic.datetime_parse import parse_datetime
 
 from utils.utils import clean_address
 
 
+def to_optional(type_, value):
+    if value is None:
+        return None
+    if type_ is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    if type_ is not str and isinstance(value, str):
+        raise TypeError(value)
+    return type_(value)
+
+
+def to_moscow_datetime(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = parse_datetime(value)
+    else:
+        value = parse_datetime(value)
+    return value + timedelta(hours=3)
+
+
 class BaseModelConfig(BaseModel):
     class Config:
         alias_generator = snake_to_camel
@@ -39,6 +64,65 @@ class InvestInfo(BaseModelConfig):
     deposit: Optional[int]  # Размер задатка.
     clean_address: Optional[str]  # Очищенный адрес элемента.
 
+    @classmethod
+    def from_raw(cls, raw: dict) -> InvestInfo:
+        """
+        Быстрое создание из ответа searchTenderObjects без валидации pydantic.
+        Повторяет преобразования валидаторов, при любой ошибке - parse_obj
+        """
+        try:
+            return cls.construct(**cls.convert_raw(raw))
+        except (Exception,):
+            return cls.parse_obj(raw)
+
+    @classmethod
+    def convert_raw(cls, raw: dict) -> dict:
+        object_type_name = raw.get('objectTypeName')
+        rooms_count = raw.get('roomsCount')
+        if isinstance(object_type_name, str) \
+                and 'комната' in object_type_name.lower():
+            rooms_count = 0
+
+        room_floors = raw.get('roomFloors')
+        if room_floors is not None:
+            if isinstance(room_floors, list) and len(room_floors) > 0:
+                room_floors = room_floors[0]
+            else:
+                room_floors = 1
+
+        attached_pics = raw.get('attachedPics')
+        if attached_pics is not None:
+            attached_pics = [
+                Images.construct(url=to_optional(str, pic.get('url')))
+                for pic in attached_pics
+            ]
+
+        address = raw['address']
+        if not isinstance(address, str):
+            raise TypeError(address)
+
+        # object_area объявлен раньше is_io_area_in_hectars, поэтому
+        # convert_to_square_meters при parse_obj не видит флаг гектаров
+        return dict(
+            id=int(raw['id']),
+            url=str(raw['url']),
+            object_type_name=to_optional(str, object_type_name),
+            object_area=to_optional(float, raw.get('objectArea')),
+            is_io_area_in_hectars=to_optional(bool, raw.get('isIoAreaInHectars')),
+            address=address,
+            start_price=to_optional(int, raw.get('startPrice')),
+            price_per_square=to_optional(int, raw.get('pricePerSquare')),
+            floors=to_optional(int, raw.get('floors')),
+            room_floors=to_optional(int, room_floors),
+            rooms_count=to_optional(int, rooms_count),
+            request_end_date=to_moscow_datetime(raw.get('requestEndDate')),
+            tender_date=to_moscow_datetime(raw.get('tenderDate')),
+            attached_pics=attached_pics,
+            image_url=attached_pics[0].url if attached_pics else None,
+            deposit=None,
+            clean_address=clean_address(address),
+        )
+
     @validator('tender_date', 'request_end_date')
     def add_three_hours(cls, value):
         if isinstance(value, datetime):
@@ -139,37 +223,121 @@ class Tender(BaseModel):
     station_type: Optional[str]
 
 
+class CompactTender:
+    """
+    Легкая запись тендера для больших выдач: __slots__ вместо модели pydantic,
+    повторяющиеся строки (район, метро, тип стен и т.д.) интернируются и
+    хранятся в одном экземпляре на все записи
+    """
+    __slots__ = tuple(Tender.__fields__)
+
+    CATEGORICAL_FIELDS = (
+        'realty_type',
+        'city',
+        'district',
+        'region',
+        'metro_station',
+        'renovation',
+        'floors_type',
+        'walls_type',
+        'metro_color',
+        'station_type',
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+        self.intern_strings()
+
+    def intern_strings(self) -> None:
+        for name in self.CATEGORICAL_FIELDS:
+            value = getattr(self, name)
+            if isinstance(value, str):
+                setattr(self, name, sys.intern(value))
+
+    @classmethod
+    def from_tender(cls, tender: Tender) -> CompactTender:
+        return cls(**{name: getattr(tender, name) for name in cls.__slots__})
+
+    def to_tender(self) -> Tender:
+        return Tender.construct(
+            **{name: getattr(self, name) for name in self.__slots__}
+        )
+
+    def dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompactTender):
+            return NotImplemented
+        return self.dict() == other.dict()
+
+    def __repr__(self) -> str:
+        return f'CompactTender(idx={self.idx}, address={self.address!r})'
+
+
 class TenderBuilder:
+    # Поле Tender -> поле InvestInfo
+    INVEST_FIELDS = {
+        'idx': 'id',
+        'realty_link': 'url',
+        'image_link': 'image_url',
+        'realty_type': 'object_type_name',
+        'square_meters': 'object_area',
+        'full_address': 'address',
+        'address': 'clean_address',
+        'price': 'start_price',
+        'price_per_square_meter': 'price_per_square',
+        'floors_number': 'floors',
+        'floor': 'room_floors',
+        'rooms_number': 'rooms_count',
+        'deposit': 'deposit',
+        'accepting_end_date': 'request_end_date',
+        'trading_date': 'tender_date',
+    }
+    # Поля Tender, которые берутся из FlatInfo без переименования
+    FLATINFO_FIELDS = (
+        'city',
+        'district',
+        'region',
+        'metro_station',
+        'metro_distance',
+        'building_year',
+        'renovation',
+        'ceiling_height',
+        'floors_type',
+        'walls_type',
+        'metro_color',
+        'flatinfo_url',
+        'station_type',
+    )
+
+    @staticmethod
+    def get_values(flatinfo, invest) -> dict:
+        values = {
+            field: getattr(invest, invest_field)
+            for field, invest_field in TenderBuilder.INVEST_FIELDS.items()
+        }
+        for field in TenderBuilder.FLATINFO_FIELDS:
+            values[field] = getattr(flatinfo, field)
+        return values
+
     @staticmethod
     def build(flatinfo, invest):
         tender = Tender.construct(
-            idx=invest.id,
-            realty_link=invest.url,
-            image_link=invest.image_url,
-            realty_type=invest.object_type_name,
-            square_meters=invest.object_area,
-            full_address=invest.address,
-            address=invest.clean_address,
-            price=invest.start_price,
-            price_per_square_meter=invest.price_per_square,
-            floors_number=invest.floors,
-            floor=invest.room_floors,
-            rooms_number=invest.rooms_count,
-            deposit=invest.deposit,
-            accepting_end_date=invest.request_end_date,
-            trading_date=invest.tender_date,
-            city=flatinfo.city,
-            district=flatinfo.district,
-            region=flatinfo.region,
-            metro_station=flatinfo.metro_station,
-            metro_distance=flatinfo.metro_distance,
-            building_year=flatinfo.building_year,
-            renovation=flatinfo.renovation,
-            ceiling_height=flatinfo.ceiling_height,
-            floors_type=flatinfo.floors_type,
-            walls_type=flatinfo.walls_type,
-            metro_color=flatinfo.metro_color,
-            flatinfo_url=flatinfo.flatinfo_url,
-            station_type=flatinfo.station_type
+            **TenderBuilder.get_values(flatinfo, invest)
         )
         return tender
+
+    @staticmethod
+    def build_compact(flatinfo, invest):
+        """
+        Заполняет слоты CompactTender напрямую, без промежуточного словаря
+        """
+        tender = CompactTender.__new__(CompactTender)
+        for field, invest_field in TenderBuilder.INVEST_FIELDS.items():
+            setattr(tender, field, getattr(invest, invest_field))
+        for field in TenderBuilder.FLATINFO_FIELDS:
+            setattr(tender, field, getattr(flatinfo, field))
+        tender.intern_strings()
+        return tender
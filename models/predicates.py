@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import operator
+from typing import Any, Dict, Iterable, List, Optional
+
+from models.filter_models import FilterParams, Range
+from models.models import Tender, TenderBuilder
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda value, values: value in values,
+}
+# Этапы получения полей Tender, от дешевого к дорогому
+STAGES = ('invest', 'deposit', 'flatinfo')
+# Поле Tender -> диапазон FilterParams, которым его можно ограничить в API
+PUSHDOWN_FIELDS = {
+    'price': 'price',
+    'square_meters': 'area',
+    'floor': 'floor',
+    'floors_number': 'number_floors',
+}
+
+
+class Predicate:
+    """
+    Условие на поле Tender, например Predicate('metro_distance', '<=', 800).
+    Тендер с пустым значением поля условие не проходит
+    """
+
+    def __init__(self, field: str, op: str, value: Any):
+        if field not in Tender.__fields__:
+            raise ValueError(f'Неизвестное поле: {field}')
+        if op not in OPERATORS:
+            raise ValueError(f'Неизвестный оператор: {op}')
+        self.field = field
+        self.op = op
+        self.value = value
+
+    @property
+    def stage(self) -> str:
+        """
+        Этап, после которого известно значение поля
+        """
+        if self.field == 'deposit':
+            return 'deposit'
+        if self.field in TenderBuilder.INVEST_FIELDS:
+            return 'invest'
+        return 'flatinfo'
+
+    def check_value(self, value: Any) -> bool:
+        if value is None:
+            return False
+        return OPERATORS[self.op](value, self.value)
+
+    def check(self, invest_info=None, flat_info=None) -> bool:
+        """
+        Проверка до сборки Tender: поля берутся из InvestInfo или FlatInfo
+        """
+        if self.stage == 'flatinfo':
+            return self.check_value(getattr(flat_info, self.field))
+        invest_field = TenderBuilder.INVEST_FIELDS[self.field]
+        return self.check_value(getattr(invest_info, invest_field))
+
+    def __call__(self, tender) -> bool:
+        return self.check_value(getattr(tender, self.field))
+
+    def __repr__(self) -> str:
+        return f'Predicate({self.field!r}, {self.op!r}, {self.value!r})'
+
+
+class F:
+    """
+    Короткая запись условий: F('metro_distance') <= 800
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+
+    def __eq__(self, value) -> Predicate:
+        return Predicate(self.field, '==', value)
+
+    def __ne__(self, value) -> Predicate:
+        return Predicate(self.field, '!=', value)
+
+    def __lt__(self, value) -> Predicate:
+        return Predicate(self.field, '<', value)
+
+    def __le__(self, value) -> Predicate:
+        return Predicate(self.field, '<=', value)
+
+    def __gt__(self, value) -> Predicate:
+        return Predicate(self.field, '>', value)
+
+    def __ge__(self, value) -> Predicate:
+        return Predicate(self.field, '>=', value)
+
+    def isin(self, values: Iterable) -> Predicate:
+        return Predicate(self.field, 'in', tuple(values))
+
+
+def group_predicates(predicates: Iterable[Predicate]) -> Dict[str, List[Predicate]]:
+    groups = {stage: [] for stage in STAGES}
+    for predicate in predicates:
+        groups[predicate.stage].append(predicate)
+    return groups
+
+
+def get_bounds(predicates: Iterable[Predicate], field: str):
+    """
+    Нестрогие границы поля из условий, строгость проверяется локально
+    """
+    low, high = None, None
+    for predicate in predicates:
+        if predicate.field != field:
+            continue
+        if predicate.op in ('>', '>=', '=='):
+            low = predicate.value if low is None else max(low, predicate.value)
+        if predicate.op in ('<', '<=', '=='):
+            high = predicate.value if high is None else min(high, predicate.value)
+    return low, high
+
+
+def format_bound(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def merge_bound(current: Optional[str], value, pick) -> Optional[str]:
+    if value is None:
+        return current
+    if current is None or current == '':
+        return format_bound(value)
+    return format_bound(pick(float(current), value))
+
+
+def push_down(
+        params: FilterParams,
+        predicates: Iterable[Predicate],
+) -> FilterParams:
+    """
+    Копия FilterParams, в которую перенесены условия, выразимые
+    диапазонами API. Диапазон API требует обе границы, поэтому условие
+    переносится, только если вторая граница тоже известна (из params
+    или из другого условия). Условия все равно проверяются локально
+    """
+    predicates = list(predicates)
+    update = {}
+    for field, range_name in PUSHDOWN_FIELDS.items():
+        low, high = get_bounds(predicates, field)
+        if low is None and high is None:
+            continue
+
+        current: Optional[Range] = getattr(params, range_name)
+        new_min = merge_bound(current and current.min, low, max)
+        new_max = merge_bound(current and current.max, high, min)
+        if new_min is None or new_max is None:
+            continue
+        update[range_name] = Range(min=new_min, max=new_max)
+
+    return params.copy(update=update)
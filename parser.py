@@ -1,11 +1,46 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import chain, islice, repeat
 from math import ceil
-from typing import Optional
+from typing import (
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import requests
 
 from exceptions import BadAddressError
+from models.create_filter_models import FilterIndex
 from models.filter_models import FilterParams
-from models.models import InvestInfo, FlatInfo, TenderBuilder
-from utils.html_parser import HtmlParser
-from utils.utils import HTTPMethod, DecodeTo, get_url
+from models.models import CompactTender, InvestInfo, FlatInfo, Tender, TenderBuilder
+from models.predicates import Predicate, group_predicates, push_down
+from utils.cache import MISSING, NO_EXPIRY_TTL, BaseCache
+from utils.checkpoint import Checkpoint, checkpoint_key
+from utils.concurrency import HostLimiter, InFlightCache
+from utils.cpu import chunked, parse_flatinfo_page, parse_invest, parse_invest_batch
+from utils.metrics import Metrics, metrics as default_metrics
+from utils.session import SessionPool
+from utils.snapshot import SnapshotStore, tender_hash
+from utils.utils import (
+    HTTPMethod,
+    DecodeTo,
+    content_hash,
+    endpoint_name,
+    get_conditional_headers,
+    get_url,
+    get_validators,
+    json_loads,
+    normalize_address,
+)
 from logger import log
 
 
@@ -14,12 +49,39 @@ class ParserRequests:
     URL_INVEST = 'https://api.investmoscow.ru/investmoscow/tender/v2/filtered-tenders/searchTenderObjects'
     URL_TENDER = 'https://api.investmoscow.ru/investmoscow/tender/v1/object-info/getTenderObjectInformation'
 
+    def __init__(
+            self,
+            host_limits: Optional[Dict[str, int]] = None,
+            sessions: Optional[SessionPool] = None,
+            host_rates: Optional[Dict[str, float]] = None,
+            metrics: Optional[Metrics] = None,
+    ):
+        self.metrics = metrics or default_metrics
+        self.host_limiter = HostLimiter(host_limits, rates=host_rates)
+        self.own_sessions = sessions is None
+        if self.own_sessions:
+            sessions = SessionPool(self.host_limiter.limits)
+        self.sessions = sessions
+
+    def close(self) -> None:
+        if self.own_sessions:
+            self.sessions.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def get_page_invest(self, params: dict) -> dict:
         res = get_url(
             HTTPMethod.POST,
             DecodeTo.JSON,
             self.URL_INVEST,
+            session=self.sessions.session,
+            metrics=self.metrics,
             json=params,
+            throttle=self.host_limiter.get_throttle(self.URL_INVEST),
         )
         return res
 
@@ -28,7 +90,10 @@ class ParserRequests:
             HTTPMethod.GET,
             DecodeTo.JSON,
             self.URL_TENDER,
+            session=self.sessions.session,
+            metrics=self.metrics,
             params=params,
+            throttle=self.host_limiter.get_throttle(self.URL_TENDER),
         )
         return res
 
@@ -37,59 +102,61 @@ class ParserRequests:
             HTTPMethod.GET,
             DecodeTo.JSON,
             self.URL_FLATINFO,
+            session=self.sessions.session,
+            metrics=self.metrics,
             params=params,
+            throttle=self.host_limiter.get_throttle(self.URL_FLATINFO),
         )
         return res
 
-    @staticmethod
-    def get_page_flatinfo(url: str) -> dict:
+    def get_page_flatinfo(self, url: str) -> str:
+        res = self.get_response(url)
+        # Страница ошибки (404, 500) не разбирается как дом без данных
+        res.raise_for_status()
+        return res.text
+
+    def get_response(
+            self,
+            url: str,
+            headers: Optional[dict] = None,
+            **kwargs,
+    ) -> requests.Response:
+        """
+        GET-запрос без разбора тела, для условных запросов
+        """
         res = get_url(
             HTTPMethod.GET,
-            DecodeTo.TEXT,
+            DecodeTo.RESPONSE,
             url,
+            session=self.sessions.session,
+            metrics=self.metrics,
+            headers=headers,
+            throttle=self.host_limiter.get_throttle(url),
+            **kwargs,
         )
         return res
 
 
-class Parser(ParserRequests):
+class ParserBase:
+    """
+    Общая логика синхронного и асинхронного парсеров, не выполняющая запросов
+    """
     PAGE_SIZE = 10
-
-    def __init__(self):
-        self.params = None
-        self.address_cache = {}
-        self.url_cache = {}
-
-    def run(self, params: FilterParams):
-        self.params: FilterParams = params
-        self.params.page_size = self.PAGE_SIZE
-        self.address_cache = {}
-        self.url_cache = {}
-
-        end_page_number = self._get_end_page_number()
-        all_tenders = []
-
-        for page_number in range(1, end_page_number):
-            tenders_found = self._get_page_data(page_number)
-            cleaned_tenders = self.clear_entities(tenders_found)
-            all_tenders.extend(cleaned_tenders)
-
-        obj_tenders = []
-        for tender in all_tenders:
-            obj_tender = self.construct_tender(tender)
-            if obj_tender is not None:
-                obj_tenders.append(obj_tender)
-
-        return obj_tenders
-
-    def _get_page_data(self, page_number: int):
-        self.params.page_number = page_number
-        params = self.params.dict(
-            by_alias=True,
-            exclude_none=True
-        )
-
-        res = self.get_page_invest(params)
-        return res
+    AUTO_PAGE_SIZES = (100, 50, 20, 10)
+    DEPOSIT_MODES = ('eager', 'lazy', 'skip')
+    metrics = default_metrics
+    profile_stages = ()
+    strict = False
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Замеряет время этапа, этапы из profile_stages профилируются cProfile
+        """
+        profile = self.metrics.profile(name) \
+            if name in self.profile_stages else nullcontext()
+        with profile, self.metrics.timer('stage_seconds', stage=name):
+            yield
 
     def clear_entities(self, tenders: dict):
         entities = tenders.get('entities')
@@ -97,11 +164,20 @@ class Parser(ParserRequests):
             return []
 
         cleaned_tenders = []
+        found_count = 0
 
         for entity in entities:
+            found_count += len(entity.get('tenders') or [])
             tenders = self.clear_tenders(entity)
             cleaned_tenders.extend(tenders)
 
+        dropped_count = found_count - len(cleaned_tenders)
+        if dropped_count:
+            self.metrics.inc(
+                'tenders_dropped_total',
+                dropped_count,
+                reason='moscow_region',
+            )
         return cleaned_tenders
 
     @staticmethod
@@ -118,17 +194,38 @@ class Parser(ParserRequests):
 
         return cleaned_tenders
 
-    def _get_end_page_number(self) -> int:
-        count_buildings = self._get_page_data(1)['totalCount']
-        end_page_number = ceil(count_buildings / self.PAGE_SIZE) + 1
-        return end_page_number
+    def get_end_page_number(
+            self,
+            count_buildings: int,
+            page_size: Optional[int] = None,
+    ) -> int:
+        page_size = page_size or self.PAGE_SIZE
+        return ceil(count_buildings / page_size) + 1
+
+    def get_page_params(
+            self,
+            page_number: int,
+            page_size: int,
+            params: Optional[FilterParams] = None,
+    ) -> dict:
+        params = (params or self.params).copy(
+            update={
+                'page_number': page_number,
+                'page_size': page_size,
+            }
+        )
+        return params.dict(
+            by_alias=True,
+            exclude_none=True
+        )
 
-    def _get_tender_detail(self, tender_id: int):
-        params = {
-            "tenderId": tender_id
-        }
-        res = self.get_deposit_invest(params)
-        return res
+    @staticmethod
+    def is_full_page(page: dict, page_size: int) -> bool:
+        entities = page.get('entities')
+        count_buildings = page.get('totalCount')
+        if not isinstance(entities, list) or count_buildings is None:
+            return False
+        return len(entities) == min(page_size, count_buildings)
 
     def get_deposit(self, tender_detail: dict) -> Optional[int]:
         procedure_info = tender_detail.get('procedureInfo')
@@ -160,6 +257,434 @@ class Parser(ParserRequests):
 
         return
 
+    @staticmethod
+    def parse_flatinfo(text_page: str, url: str) -> FlatInfo:
+        return parse_flatinfo_page(text_page, url)
+
+    def parse_invest(self, invest: dict) -> InvestInfo:
+        return parse_invest(invest, self.strict)
+
+
+class Parser(ParserBase, ParserRequests):
+    def __init__(
+            self,
+            workers: int = 1,
+            host_limits: Optional[Dict[str, int]] = None,
+            host_rates: Optional[Dict[str, float]] = None,
+            sessions: Optional[SessionPool] = None,
+            cache: Optional[BaseCache] = None,
+            snapshot: Optional[SnapshotStore] = None,
+            page_size: Union[int, str] = ParserBase.PAGE_SIZE,
+            page_workers: int = 4,
+            processes: int = 0,
+            cpu_batch_size: int = 50,
+            metrics: Optional[Metrics] = None,
+            profile_stages: Iterable[str] = (),
+            compact: bool = False,
+            strict: bool = False,
+            deposits: str = 'eager',
+            checkpoint_dir: Optional[str] = None,
+            filter_index: Optional[FilterIndex] = None,
+            predicates: Iterable[Predicate] = (),
+    ):
+        """
+        workers - количество потоков для обогащения тендеров
+        host_limits - ограничения одновременных запросов по хостам,
+            например {'flatinfo.ru': 2}
+        host_rates - максимальная частота запросов к хостам (в секунду),
+            при 503/429 частота и параллельность снижаются автоматически
+        sessions - общий пул соединений, его закрывает владелец
+        cache - кэш flatinfo между запусками (SqliteCache) или общий
+            для нескольких хостов (TieredCache с RedisCache)
+        snapshot - снимок прошлого запуска: обогащаются только новые
+            и изменившиеся тендеры
+        page_size - размер страницы выдачи или 'auto', чтобы подобрать
+            наибольший размер, который принимает API
+        page_workers - количество страниц, загружаемых одновременно
+        processes - количество процессов для разбора html и валидации
+            моделей, 0 - разбирать в текущем процессе
+        cpu_batch_size - сколько тендеров передавать в процесс за раз
+        metrics - куда писать метрики, по умолчанию utils.metrics.metrics
+        profile_stages - этапы, которые нужно профилировать cProfile:
+            page, invest_parse, construct_tender, deposit, flatinfo_parse
+        compact - возвращать CompactTender вместо Tender, чтобы большие
+            выдачи занимали меньше памяти
+        strict - проверять тендеры выдачи полной валидацией pydantic,
+            по умолчанию используется быстрый InvestInfo.from_raw
+        deposits - как получать задаток (отдельный запрос на тендер):
+            'eager' - при обогащении, 'lazy' - только в resolve_deposits,
+            'skip' - не запрашивать. С cache задатки сохраняются навсегда
+        checkpoint_dir - каталог журналов запусков: загруженные страницы
+            и тендеры пишутся по ходу запуска, run(params, resume=True)
+            продолжает прерванный запуск
+        filter_index - справочник фильтров (FilterIndex.load()): коды
+            в FilterParams проверяются до загрузки выдачи
+        predicates - условия на поля Tender (models.predicates.F):
+            условия на цену, площадь и этажи переносятся в FilterParams,
+            остальные проверяются до запросов деталей и flatinfo
+        """
+        if deposits not in self.DEPOSIT_MODES:
+            raise ValueError(f'Неизвестный режим задатков: {deposits}')
+
+        super().__init__(host_limits, sessions, host_rates, metrics)
+        self.deposits = deposits
+        self.checkpoint_dir = checkpoint_dir
+        self.filter_index = filter_index
+        self.predicates = tuple(predicates)
+        self.stage_predicates = group_predicates(self.predicates)
+        self.profile_stages = tuple(profile_stages)
+        self.compact = compact
+        self.strict = strict
+        self.workers = workers
+        self.cache = cache
+        self.snapshot = snapshot
+        self.page_size = page_size
+        self.page_workers = page_workers
+        self.processes = processes
+        self.cpu_batch_size = cpu_batch_size
+        self.cpu_pool = None
+        self.updated_ids = []
+        self.removed_ids = []
+        self.failed_ids = []
+        self.params = None
+        self.reset_caches()
+
+    def close(self) -> None:
+        super().close()
+        if self.cpu_pool is not None:
+            self.cpu_pool.shutdown()
+            self.cpu_pool = None
+
+    def get_cpu_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.processes > 0 and self.cpu_pool is None:
+            self.cpu_pool = ProcessPoolExecutor(max_workers=self.processes)
+        return self.cpu_pool
+
+    def run(self, params: FilterParams, resume: bool = False):
+        return list(self.iter_tenders(params, resume))
+
+    def iter_tenders(
+            self,
+            params: FilterParams,
+            resume: bool = False,
+    ) -> Iterator[Tender]:
+        """
+        Отдает тендеры по мере загрузки страниц, не дожидаясь конца выдачи.
+        resume - продолжить прерванный запуск по журналу из checkpoint_dir
+        """
+        params = self.prepare_params(params)
+        self.params: FilterParams = params
+        self.reset_caches()
+        self.updated_ids = []
+        self.removed_ids = []
+        self.failed_ids = []
+
+        checkpoint = self.open_checkpoint(params, resume)
+        try:
+            yield from self._iter_tenders(checkpoint)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+    def _iter_tenders(self, checkpoint: Optional[Checkpoint]) -> Iterator[Tender]:
+        if checkpoint is not None and 1 in checkpoint.pages:
+            page_size = checkpoint.page_size
+            first_page = checkpoint.pages[1]
+        else:
+            first_page, page_size = self._get_first_page()
+            if checkpoint is not None:
+                checkpoint.start(first_page['totalCount'], page_size)
+        found_ids = set()
+
+        pages = self.iter_pages(first_page, page_size)
+        if checkpoint is not None:
+            done_pages = sorted(checkpoint.pages.items())
+            pages = chain(
+                done_pages,
+                self.iter_pages(
+                    first_page,
+                    page_size,
+                    done_pages=set(checkpoint.pages),
+                ),
+            )
+
+        with self.create_pool() as pool:
+            for page_number, tenders_found in pages:
+                if checkpoint is not None \
+                        and page_number not in checkpoint.page_numbers:
+                    checkpoint.add_page(page_number, tenders_found)
+
+                cleaned_tenders = self.clear_entities(tenders_found)
+                found_ids.update(tender.get('id') for tender in cleaned_tenders)
+
+                for obj_tender in self.construct_page(
+                        cleaned_tenders,
+                        pool,
+                        checkpoint,
+                ):
+                    yield obj_tender
+
+        if self.snapshot is not None:
+            self.remove_missing(found_ids)
+        if checkpoint is not None:
+            checkpoint.finish()
+
+    def prepare_params(self, params: FilterParams) -> FilterParams:
+        if self.filter_index is not None:
+            self.filter_index.validate(params)
+        if self.predicates:
+            params = push_down(params, self.predicates)
+        return params
+
+    def open_checkpoint(
+            self,
+            params: FilterParams,
+            resume: bool,
+    ) -> Optional[Checkpoint]:
+        if self.checkpoint_dir is None:
+            if resume:
+                raise ValueError('Для resume нужен checkpoint_dir')
+            return
+
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = os.path.join(
+            self.checkpoint_dir,
+            f'{checkpoint_key(params)}.jsonl',
+        )
+        return Checkpoint(path, resume)
+
+    def construct_page(
+            self,
+            tenders: list,
+            pool: Optional[ThreadPoolExecutor] = None,
+            checkpoint: Optional[Checkpoint] = None,
+    ) -> Iterator[Tender]:
+        """
+        Обогащает тендеры страницы, уже обогащенные берутся из журнала
+        """
+        if checkpoint is None:
+            done, pending = {}, tenders
+        else:
+            done = checkpoint.tenders
+            pending = [tender for tender in tenders
+                       if tender.get('id') not in done]
+
+        obj_tenders = self.construct_tenders(pending, pool)
+        for tender in tenders:
+            row = done.get(tender.get('id'))
+            if row is not None:
+                obj_tender = Tender.parse_obj(row)
+                if self.compact:
+                    obj_tender = CompactTender.from_tender(obj_tender)
+                yield obj_tender
+                continue
+
+            obj_tender = next(obj_tenders)
+            if obj_tender is None:
+                continue
+            if checkpoint is not None:
+                checkpoint.add_tender(obj_tender)
+            yield obj_tender
+
+    def run_many(self, params_list: List[FilterParams]) -> List[List[Tender]]:
+        """
+        Выполняет несколько фильтров сразу: страницы всех фильтров
+        загружаются параллельно, а тендер, найденный несколькими фильтрами,
+        обогащается один раз. Возвращает списки тендеров в порядке фильтров.
+        Снятые тендеры (removed_ids) в этом режиме не вычисляются
+        """
+        params_list = [self.prepare_params(params) for params in params_list]
+        self.reset_caches()
+        self.updated_ids = []
+        self.removed_ids = []
+        self.failed_ids = []
+
+        query_workers = max(min(len(params_list), self.page_workers), 1)
+        with ThreadPoolExecutor(max_workers=query_workers) as pool:
+            raw_lists = list(pool.map(self.get_raw_tenders, params_list))
+
+        unique_tenders = {}
+        for raw_tenders in raw_lists:
+            for tender in raw_tenders:
+                unique_tenders.setdefault(tender.get('id'), tender)
+
+        with self.create_pool() as pool:
+            obj_tenders = dict(zip(
+                unique_tenders,
+                self.construct_tenders(list(unique_tenders.values()), pool),
+            ))
+
+        results = []
+        for raw_tenders in raw_lists:
+            tenders = []
+            for tender in raw_tenders:
+                obj_tender = obj_tenders[tender.get('id')]
+                if obj_tender is not None:
+                    tenders.append(obj_tender)
+            results.append(tenders)
+        return results
+
+    def get_raw_tenders(self, params: FilterParams) -> List[dict]:
+        first_page, page_size = self._get_first_page(params)
+        raw_tenders = []
+        for _, tenders_found in self.iter_pages(first_page, page_size, params):
+            raw_tenders.extend(self.clear_entities(tenders_found))
+        return raw_tenders
+
+    def reset_caches(self) -> None:
+        self.address_cache = InFlightCache('address', self.metrics)
+        self.url_cache = InFlightCache('url', self.metrics)
+
+    def iter_pages(
+            self,
+            first_page: dict,
+            page_size: int,
+            params: Optional[FilterParams] = None,
+            done_pages: Container[int] = (),
+    ) -> Iterator[Tuple[int, dict]]:
+        """
+        Отдает пары (номер, страница). Первая страница уже загружена
+        с размером page_size, остальные загружаются с тем же размером
+        параллельно с ограниченным окном, чтобы не держать в памяти всю
+        выдачу. Страницы из done_pages пропускаются
+        """
+        if 1 not in done_pages:
+            yield 1, first_page
+
+        end_page_number = self.get_end_page_number(
+            first_page['totalCount'],
+            page_size,
+        )
+        page_numbers = (
+            page_number for page_number in range(2, end_page_number)
+            if page_number not in done_pages
+        )
+        window = max(self.page_workers, 1) * 2
+
+        with ThreadPoolExecutor(max_workers=max(self.page_workers, 1)) as pool:
+            futures = deque(
+                (page_number, pool.submit(
+                    self._get_page_data,
+                    page_number,
+                    page_size,
+                    params,
+                ))
+                for page_number in islice(page_numbers, window)
+            )
+            while futures:
+                page_number, future = futures.popleft()
+                page = future.result()
+                for next_number in islice(page_numbers, 1):
+                    futures.append((next_number, pool.submit(
+                        self._get_page_data,
+                        next_number,
+                        page_size,
+                        params,
+                    )))
+                yield page_number, page
+
+    def _get_first_page(
+            self,
+            params: Optional[FilterParams] = None,
+    ) -> Tuple[dict, int]:
+        """
+        Первая страница и размер страницы, с которым нужно загружать
+        остальные. При page_size='auto' размер подбирается для каждой
+        выдачи отдельно
+        """
+        if self.page_size != 'auto':
+            return self._get_page_data(1, self.page_size, params), self.page_size
+
+        for page_size in self.AUTO_PAGE_SIZES:
+            try:
+                page = self._get_page_data(1, page_size, params)
+            except (Exception,):
+                continue
+
+            if self.is_full_page(page, page_size):
+                return page, page_size
+
+        return self._get_page_data(1, self.PAGE_SIZE, params), self.PAGE_SIZE
+
+    def create_pool(self):
+        if self.workers <= 1:
+            return nullcontext()
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def construct_tenders(
+            self,
+            tenders: list,
+            pool: Optional[ThreadPoolExecutor] = None,
+    ) -> Iterator[Optional[Tender]]:
+        invest_infos = self.parse_invests(tenders)
+        if pool is None:
+            return map(self.get_tender, tenders, invest_infos)
+        return pool.map(self.get_tender, tenders, invest_infos)
+
+    def parse_invests(self, tenders: list) -> List[Optional[InvestInfo]]:
+        """
+        Валидирует тендеры страницы пачками в пуле процессов. Без пула
+        валидация выполняется позже, в construct_tender
+        """
+        cpu_pool = self.get_cpu_pool()
+        if cpu_pool is None:
+            return [None] * len(tenders)
+
+        batches = chunked(tenders, self.cpu_batch_size)
+        invest_infos = []
+        with self.stage('invest_parse'):
+            for batch in cpu_pool.map(
+                    parse_invest_batch,
+                    batches,
+                    repeat(self.strict),
+            ):
+                invest_infos.extend(batch)
+        return invest_infos
+
+    def get_tender(self, invest, invest_info: Optional[InvestInfo] = None):
+        if self.snapshot is None:
+            return self.construct_tender(invest, invest_info)
+
+        tender_id = invest.get('id')
+        hash_ = tender_hash(invest)
+        tender = self.snapshot.get(tender_id, hash_)
+        if tender is not None:
+            if not self.matches(tender):
+                return
+            if self.compact:
+                return CompactTender.from_tender(tender)
+            return tender
+
+        tender = self.construct_tender(invest, invest_info)
+        if tender is not None:
+            snapshot_tender = tender.to_tender() \
+                if isinstance(tender, CompactTender) else tender
+            self.snapshot.put(tender_id, hash_, snapshot_tender)
+            self.updated_ids.append(tender_id)
+        return tender
+
+    def remove_missing(self, found_ids: Set[int]) -> None:
+        self.removed_ids = sorted(self.snapshot.ids() - found_ids)
+        self.snapshot.remove(self.removed_ids)
+
+    def _get_page_data(
+            self,
+            page_number: int,
+            page_size: int,
+            params: Optional[FilterParams] = None,
+    ):
+        page_params = self.get_page_params(page_number, page_size, params)
+        with self.stage('page'):
+            res = self.get_page_invest(page_params)
+        return res
+
+    def _get_tender_detail(self, tender_id: int):
+        params = {
+            "tenderId": tender_id
+        }
+        res = self.get_deposit_invest(params)
+        return res
+
     def get_url_by_address(self, address):
         params = {
             'term': address
@@ -171,44 +696,239 @@ class Parser(ParserRequests):
         else:
             raise BadAddressError(address)
 
-    def construct_tender(self, invest):
+    def construct_tender(self, invest, invest_info: Optional[InvestInfo] = None):
         try:
-            invest_info = InvestInfo.parse_obj(invest)
-
-            tender_id = invest_info.id
-            tender_detail = self._get_tender_detail(tender_id)
-            deposit = self.get_deposit(tender_detail)
-            invest_info.deposit = deposit
+            with self.stage('construct_tender'):
+                if invest_info is None:
+                    invest_info = self.parse_invest(invest)
+                if not self.check_stage('invest', invest_info):
+                    return
+
+                flat_info = None
+                for stage in self.get_enrich_stages(invest_info):
+                    if stage == 'deposit':
+                        invest_info.deposit = self.get_cached_deposit(invest_info.id)
+                    else:
+                        flat_info = self.get_flatinfo(invest_info.clean_address)
+                    if not self.check_stage(stage, invest_info, flat_info):
+                        return
+
+                if self.compact:
+                    tender_obj = TenderBuilder.build_compact(flat_info, invest_info)
+                else:
+                    tender_obj = TenderBuilder.build(flat_info, invest_info)
+                return tender_obj
+        except (Exception,) as e:
+            # В отличие от отсеянных условиями, тендер с ошибкой
+            # можно попробовать собрать еще раз
+            self.failed_ids.append(invest.get('id'))
+            self.metrics.inc('tenders_dropped_total', reason=type(e).__name__)
+            log.debug(f'Тендер {invest.get("id")} пропущен: {e!r}')
+            return
 
-            flat_info = self.get_flatinfo(invest_info.clean_address)
-            tender_obj = TenderBuilder.build(flat_info, invest_info)
-            return tender_obj
-        except (Exception,):
+    def get_enrich_stages(self, invest_info: InvestInfo) -> List[str]:
+        """
+        Порядок этапов обогащения: этап с условиями выполняется первым,
+        чтобы не делать запросы для тендеров, которые условия не пройдут.
+        Если условия есть на обоих этапах, первым идет более дешевый:
+        задаток - один запрос, flatinfo - два, если адрес еще не в кэше
+        """
+        predicates = self.stage_predicates
+        if self.deposits != 'eager' and not predicates['deposit']:
+            return ['flatinfo']
+
+        if predicates['flatinfo'] and (
+                not predicates['deposit']
+                or self.is_flatinfo_cached(invest_info.clean_address)
+        ):
+            return ['flatinfo', 'deposit']
+        return ['deposit', 'flatinfo']
+
+    def is_flatinfo_cached(self, address: str) -> bool:
+        key = normalize_address(address)
+        if key in self.address_cache:
+            return True
+        if self.cache is None:
+            return False
+        return self.cache.get(f'address:{key}') is not MISSING
+
+    def check_stage(self, stage: str, invest_info, flat_info=None) -> bool:
+        for predicate in self.stage_predicates[stage]:
+            if not predicate.check(invest_info, flat_info):
+                self.metrics.inc('tenders_filtered_total', stage=stage)
+                return False
+        return True
+
+    def matches(self, tender) -> bool:
+        return all(predicate(tender) for predicate in self.predicates)
+
+    def resolve_deposits(self, tenders: Iterable[Tender]) -> List[Tender]:
+        """
+        Заполняет задатки тендеров, у которых их нет (режим 'lazy').
+        Запросы деталей выполняются в workers потоков
+        """
+        tenders = list(tenders)
+        missing = [tender for tender in tenders if tender.deposit is None]
+        tender_ids = [tender.idx for tender in missing]
+
+        with self.create_pool() as pool:
+            if pool is None:
+                deposits = list(map(self.try_get_deposit, tender_ids))
+            else:
+                deposits = list(pool.map(self.try_get_deposit, tender_ids))
+
+        for tender, deposit in zip(missing, deposits):
+            tender.deposit = deposit
+        return tenders
+
+    def try_get_deposit(self, tender_id: int) -> Optional[int]:
+        try:
+            return self.get_cached_deposit(tender_id)
+        except (Exception,) as e:
+            self.metrics.inc('deposit_failures_total', reason=type(e).__name__)
+            log.debug(f'Задаток тендера {tender_id} не получен: {e!r}')
             return
 
-    def get_flatinfo(self, address):
-        if address in self.address_cache:
-            flat_info = self.address_cache[address]
+    def get_cached_deposit(self, tender_id: int) -> Optional[int]:
+        """
+        Опубликованный задаток не меняется, поэтому хранится без срока.
+        Отсутствующий задаток кэшируется как отрицательная запись
+        """
+        if self.cache is None:
+            return self.load_deposit(tender_id)
+
+        key = f'deposit:{tender_id}'
+        deposit = self.cache.get(key)
+        if deposit is not MISSING:
+            return deposit
+
+        deposit = self.load_deposit(tender_id)
+        self.cache.set(key, deposit, None if deposit is None else NO_EXPIRY_TTL)
+        return deposit
+
+    def load_deposit(self, tender_id: int) -> Optional[int]:
+        with self.stage('deposit'):
+            if self.cache is None:
+                tender_detail = self._get_tender_detail(tender_id)
+                return self.get_deposit(tender_detail)
+
+            # Детали перепроверяются, пока задаток не опубликован
+            return self.get_revalidated(
+                f'detail:{tender_id}',
+                self.URL_TENDER,
+                lambda res: self.get_deposit(json_loads(res.content)),
+                ttl=self.cache.negative_ttl,
+                params={'tenderId': tender_id},
+            )
+
+    def get_revalidated(self, key: str, url: str, parse, ttl=None, **kwargs):
+        """
+        Разобранный ответ из кэша. Просроченная запись перепроверяется
+        условным запросом (ETag/Last-Modified), при 304 или том же хэше
+        тела повторный разбор не выполняется
+        """
+        entry = self.cache.get(key)
+        if entry is not MISSING:
+            return entry['data']
+
+        entry = self.cache.get(key, stale=True)
+        headers = get_conditional_headers(entry) if entry is not MISSING else {}
+        res = self.get_response(url, headers, **kwargs)
+        if res.status_code != 304:
+            # Ответ с ошибкой не разбирается и не попадает в кэш,
+            # устаревшая запись остается для следующей перепроверки
+            res.raise_for_status()
+
+        if entry is MISSING:
+            result = 'new'
+        elif res.status_code == 304:
+            result = 'not_modified'
+        elif content_hash(res.content) == entry['hash']:
+            result = 'unchanged'
         else:
-            try:
-                url = self.get_url_by_address(address)
-                flat_info = self.get_flatinfo_by_url(url)
-                self.address_cache[address] = flat_info
-            except BadAddressError:
-                log.error('Ошибка получения flatinfo.')
-                flat_info = FlatInfo()
+            result = 'changed'
+        self.metrics.inc(
+            'http_revalidations_total',
+            endpoint=endpoint_name(url),
+            result=result,
+        )
+
+        if result == 'not_modified':
+            validators = get_validators(res)
+            validators = {
+                name: validators[name] or entry[name]
+                for name in ('etag', 'last_modified')
+            }
+            entry = {**entry, **validators}
+        elif result == 'unchanged':
+            entry = {**entry, **get_validators(res)}
+        else:
+            entry = {**get_validators(res), 'data': parse(res)}
+
+        self.cache.set(key, entry, ttl)
+        return entry['data']
+
+    def get_flatinfo(self, address):
+        try:
+            flat_info = self.address_cache.get_or_compute(
+                normalize_address(address),
+                lambda: self.get_flatinfo_by_url(
+                    self.get_cached_url_by_address(address)
+                ),
+            )
+        except BadAddressError:
+            log.error('Ошибка получения flatinfo.')
+            flat_info = FlatInfo()
 
         return flat_info
 
     def get_flatinfo_by_url(self, url):
-        if url in self.url_cache:
-            flat_info = self.url_cache[url]
-        else:
-            text_page = self.get_page_flatinfo(url)
-            page = HtmlParser(text_page)
-            page_dict = page.parse()
-            flat_info = FlatInfo.parse_obj(page_dict)
-            flat_info.flatinfo_url = url
-            self.url_cache[url] = flat_info
+        return self.url_cache.get_or_compute(
+            url,
+            lambda: self.load_flatinfo(url),
+        )
+
+    def get_cached_url_by_address(self, address):
+        if self.cache is None:
+            return self.get_url_by_address(address)
 
+        key = f'address:{normalize_address(address)}'
+        url = self.cache.get(key)
+        if url is None:
+            raise BadAddressError(address)
+        if url is not MISSING:
+            return url
+
+        try:
+            url = self.get_url_by_address(address)
+        except BadAddressError:
+            self.cache.set(key, None)
+            raise
+
+        self.cache.set(key, url)
+        return url
+
+    def load_flatinfo(self, url):
+        if self.cache is None:
+            return self.parse_flatinfo_text(self.get_page_flatinfo(url), url)
+
+        page_dict = self.get_revalidated(
+            f'page:{url}',
+            url,
+            lambda res: self.parse_flatinfo_text(res.text, url).dict(),
+        )
+        # Словарь получен из проверенной модели, повторная валидация не нужна
+        return FlatInfo.construct(**page_dict)
+
+    def parse_flatinfo_text(self, text_page: str, url: str) -> FlatInfo:
+        cpu_pool = self.get_cpu_pool()
+        with self.stage('flatinfo_parse'):
+            if cpu_pool is None:
+                flat_info = self.parse_flatinfo(text_page, url)
+            else:
+                flat_info = cpu_pool.submit(
+                    parse_flatinfo_page,
+                    text_page,
+                    url,
+                ).result()
         return flat_info
@@ -0,0 +1,35 @@
+import asyncio
+
+from async_parser import AsyncParser
+from utils.async_utils import AsyncHostLimiter, async_wait_for_response
+from utils.metrics import Metrics
+
+
+@async_wait_for_response
+async def fake_request(number: int) -> int:
+    await asyncio.sleep(0.01)
+    return number
+
+
+def test_throttle_reused_across_event_loops():
+    limiter = AsyncHostLimiter({'host': 1}, rates={'host': 100})
+
+    async def run():
+        throttle = limiter.get_throttle('http://host/page')
+        return await asyncio.gather(
+            *(fake_request(number, throttle=throttle) for number in range(4))
+        )
+
+    assert asyncio.run(run()) == [0, 1, 2, 3]
+    assert asyncio.run(run()) == [0, 1, 2, 3]
+
+
+def test_async_construct_tender_counts_drops():
+    parser = AsyncParser()
+    parser.metrics = Metrics()
+
+    async def run():
+        return await parser.construct_tender({'id': 1})
+
+    assert asyncio.run(run()) is None
+    assert sum(parser.metrics.counters['tenders_dropped_total'].values()) == 1
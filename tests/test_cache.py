@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from utils.cache import MISSING, MemoryCache, SqliteCache, TieredCache
+
+
+@pytest.fixture
+def shared(tmp_path):
+    cache = SqliteCache(str(tmp_path / 'cache.sqlite'), ttl=0.2, negative_ttl=0.1)
+    yield cache
+    cache.close()
+
+
+def test_tiered_set_uses_shared_ttl(shared):
+    cache = TieredCache(MemoryCache(), shared)
+    cache.set('page:1', {'data': 1})
+    cache.set('address:1', None)
+    assert cache.get('page:1') == {'data': 1}
+    assert cache.get('address:1') is None
+
+    time.sleep(0.15)
+    assert cache.get('address:1') is MISSING
+    assert cache.get('page:1') == {'data': 1}
+
+    time.sleep(0.1)
+    assert cache.get('page:1') is MISSING
+    assert cache.local.get('page:1') is MISSING
+    # Просроченная запись остается для перепроверки
+    assert cache.get('page:1', stale=True) == {'data': 1}
+
+
+def test_tiered_get_keeps_remaining_ttl(shared):
+    TieredCache(MemoryCache(), shared).set('detail:1', {'data': 1}, 0.2)
+    time.sleep(0.1)
+
+    cache = TieredCache(MemoryCache(), shared)
+    assert cache.get('detail:1') == {'data': 1}
+    value, ttl = cache.local.get_with_ttl('detail:1')
+    assert value == {'data': 1}
+    assert ttl <= 0.1
+
+    time.sleep(0.15)
+    assert cache.get('detail:1') is MISSING
@@ -0,0 +1,31 @@
+from models.models import Tender
+from utils.checkpoint import Checkpoint
+
+PAGE = {'totalCount': 1, 'entities': [{'tenders': [{'id': 1}]}]}
+
+
+def make_tender(idx: int) -> Tender:
+    return Tender(
+        idx=idx,
+        realty_link=f'/tender/{idx}',
+        full_address='г. Москва, ул. Тверская, д. 1',
+        address='ул. Тверская, д. 1',
+    )
+
+
+def test_live_run_keeps_only_ids(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    with Checkpoint(path, resume=False) as checkpoint:
+        checkpoint.start(total_count=1, page_size=10)
+        checkpoint.add_page(1, PAGE)
+        checkpoint.add_tender(make_tender(1))
+
+        assert checkpoint.page_numbers == {1}
+        assert checkpoint.tender_ids == {1}
+        assert checkpoint.pages == {}
+        assert checkpoint.tenders == {}
+
+    with Checkpoint(path) as checkpoint:
+        assert checkpoint.page_size == 10
+        assert checkpoint.pages == {1: PAGE}
+        assert checkpoint.tenders[1]['realty_link'] == '/tender/1'
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from utils.cpu import parse_flatinfo_page
+from utils.html_parser import HtmlParser
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'flatinfo')
+FIXTURES = sorted(os.listdir(FIXTURES_DIR))
+METRO_FIELDS = ('metro_station', 'metro_distance', 'metro_color', 'station_type')
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def parse_full_page(html: str) -> dict:
+    # Разбор до SoupStrainer и lxml: вся страница через html.parser
+    return HtmlParser(html, features='html.parser', parse_only=None).parse()
+
+
+@pytest.mark.parametrize('name', FIXTURES)
+def test_parse_matches_full_page(name):
+    html = read_fixture(name)
+    assert HtmlParser(html).parse() == parse_full_page(html)
+
+
+@pytest.mark.parametrize('name', ['building_full.html', 'metro_multiclass.html'])
+def test_metro_block(name):
+    result = HtmlParser(read_fixture(name)).parse()
+    for field in METRO_FIELDS:
+        assert result.get(field) is not None, field
+
+
+def test_multiclass_rows():
+    result = HtmlParser(read_fixture('metro_multiclass.html')).parse()
+    assert result['district'] == 'ЗАО'
+    assert result['building_year'] == '1963'
+    assert result['metro_station'] == 'Кутузовская'
+    assert result['metro_distance'] == 650
+    assert result['station_type'] == 'mcd'
+
+
+def test_no_metro():
+    result = HtmlParser(read_fixture('no_metro.html')).parse()
+    assert not set(METRO_FIELDS) & set(result)
+    assert 'building_year' not in result
+
+
+def test_parse_flatinfo_page():
+    url = 'https://flatinfo.ru/h_info1.asp?hID=1'
+    flat_info = parse_flatinfo_page(read_fixture('building_full.html'), url)
+    assert flat_info.flatinfo_url == url
+    assert flat_info.building_year == 1956
+    assert flat_info.ceiling_height == 3
+    assert flat_info.metro_station == 'Охотный ряд'
+    assert flat_info.metro_distance == 950
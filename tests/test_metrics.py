@@ -0,0 +1,95 @@
+import pytest
+import requests
+
+from models.models import FlatInfo
+from parser import Parser
+from utils import utils
+from utils.metrics import Metrics
+from utils.utils import DecodeTo, HTTPMethod, get_url
+
+RAW_TENDER = {
+    'id': 1,
+    'url': '/tender/1',
+    'address': 'г. Москва, ул. Тверская, д. 1',
+    'objectTypeName': 'Квартира',
+    'startPrice': 100,
+}
+
+
+def make_parser(workers: int) -> Parser:
+    parser = Parser(
+        workers=workers,
+        profile_stages=('construct_tender', 'deposit'),
+        metrics=Metrics(),
+    )
+    parser._get_tender_detail = lambda tender_id: {}
+    parser.get_deposit = lambda tender_detail: 5
+    parser.get_flatinfo = lambda address: FlatInfo()
+    return parser
+
+
+def get_profiled_functions(metrics: Metrics, stage: str) -> set:
+    return {name for _, _, name in metrics.profiles[stage].stats}
+
+
+def test_nested_stage_profile():
+    parser = make_parser(workers=1)
+    tender = parser.construct_tender(dict(RAW_TENDER))
+
+    assert tender is not None and tender.deposit == 5
+    # Профиль внешнего этапа не обрывается на вложенном
+    assert 'build' in get_profiled_functions(parser.metrics, 'construct_tender')
+    assert parser.metrics.get_counter(
+        'profiles_skipped_total',
+        stage='deposit',
+    ) == 1
+
+
+def test_profile_with_workers():
+    parser = make_parser(workers=4)
+    raw_tenders = [dict(RAW_TENDER, id=number) for number in range(50)]
+    with parser.create_pool() as pool:
+        tenders = list(parser.construct_tenders(raw_tenders, pool))
+
+    assert all(tender is not None for tender in tenders)
+    assert not parser.metrics.counters.get('tenders_dropped_total')
+    assert 'construct_tender' in parser.metrics.profiles
+
+
+def test_histogram_percentiles():
+    metrics = Metrics(keep_samples=True)
+    estimated = Metrics()
+    for value in range(101):
+        metrics.observe('stage_seconds', value / 1000, stage='page')
+        estimated.observe('stage_seconds', value / 1000, stage='page')
+
+    histogram = metrics.get_histograms('stage_seconds')[(('stage', 'page'),)]
+    assert histogram.percentile(50) == 0.05
+    assert histogram.percentile(99) == 0.099
+
+    histogram = estimated.get_histograms('stage_seconds')[(('stage', 'page'),)]
+    assert 0.025 < histogram.percentile(50) <= 0.05
+    assert 0.05 < histogram.percentile(99) <= 0.1
+
+
+class FailingSession:
+    def request(self, method, url, **kwargs):
+        raise requests.ConnectionError()
+
+
+def test_retries_labelled_by_endpoint(monkeypatch):
+    monkeypatch.setattr(utils.time, 'sleep', lambda seconds: None)
+    metrics = Metrics()
+    url = Parser.URL_TENDER
+    with pytest.raises(requests.ConnectionError):
+        get_url(
+            HTTPMethod.GET,
+            DecodeTo.JSON,
+            url,
+            session=FailingSession(),
+            metrics=metrics,
+        )
+
+    labels = {'endpoint': 'getTenderObjectInformation', 'reason': 'ConnectionError'}
+    assert metrics.get_counter('http_retries_total', **labels) == utils.MAX_RETRIES
+    assert metrics.get_counter('http_failures_total', **labels) == 1
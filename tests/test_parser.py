@@ -0,0 +1,67 @@
+from collections import defaultdict
+from threading import Lock
+
+from models.filter_models import FilterParams, Range
+from parser import Parser
+from utils.metrics import Metrics
+
+TOTAL_COUNT = 200
+# Максимальный размер страницы, который отдает выдача каждого фильтра
+MAX_PAGE_SIZES = {'1': 20, '2': 100}
+
+
+class FakePages:
+    def __init__(self):
+        self.requests = defaultdict(list)
+        self._lock = Lock()
+
+    def __call__(self, params: dict) -> dict:
+        filter_id = params['price']['min']
+        page_number, page_size = params['pageNumber'], params['pageSize']
+        with self._lock:
+            self.requests[filter_id].append((page_number, page_size))
+
+        size = min(page_size, MAX_PAGE_SIZES[filter_id])
+        start = (page_number - 1) * page_size
+        ids = range(start, min(start + size, TOTAL_COUNT))
+        return {
+            'totalCount': TOTAL_COUNT,
+            'entities': [
+                {'tenders': [{'id': f'{filter_id}:{idx}', 'address': 'г. Москва'}]}
+                for idx in ids
+            ],
+        }
+
+
+def make_params(filter_id: str) -> FilterParams:
+    return FilterParams(price=Range(min=filter_id, max='1000000'))
+
+
+def make_parser() -> Parser:
+    parser = Parser(workers=1, page_workers=4, page_size='auto', metrics=Metrics())
+    parser.get_page_invest = FakePages()
+    parser.get_tender = lambda invest, invest_info=None: invest['id']
+    return parser
+
+
+def test_auto_page_size_per_filter():
+    parser = make_parser()
+    parser.run_many([make_params('1'), make_params('2')])
+
+    requests = parser.get_page_invest.requests
+    # Страницы после первой загружаются с размером, подобранным для фильтра
+    assert {size for number, size in requests['1'] if number > 1} == {20}
+    assert {size for number, size in requests['2'] if number > 1} == {100}
+    assert max(number for number, _ in requests['1']) == 10
+    assert max(number for number, _ in requests['2']) == 2
+    assert parser.page_size == 'auto'
+
+
+def test_auto_page_size_probed_on_each_run():
+    parser = make_parser()
+    parser.get_raw_tenders(make_params('2'))
+    parser.get_raw_tenders(make_params('1'))
+
+    requests = parser.get_page_invest.requests
+    assert (1, 100) in requests['1']
+    assert {size for number, size in requests['1'] if number > 1} == {20}
@@ -0,0 +1,70 @@
+import pytest
+
+from exceptions import UnknownFilterValueError
+from models.create_filter_models import Filter, FilterIndex, Model, Value
+from models.filter_models import parse_url
+from models.models import Tender
+from utils.store import TenderStore
+
+URL = 'https://investmoscow.ru/tenders?price.min=0&price.max=1000005'
+APARTMENT = 'nsi:41:30011568'
+ROOM = 'nsi:41:30011569'
+
+
+def make_tender(idx: int, realty_type: str, price: int) -> Tender:
+    return Tender(
+        idx=idx,
+        realty_link=f'/tender/{idx}',
+        realty_type=realty_type,
+        full_address='г. Москва, ул. Тверская, д. 1',
+        address='ул. Тверская, д. 1',
+        price=price,
+    )
+
+
+def make_filter_index() -> FilterIndex:
+    values = [
+        Value(code=APARTMENT, value='Квартира'),
+        Value(code=ROOM, value='Комната'),
+    ]
+    filter_ = Filter(
+        name='objectTypes',
+        type='checkbox',
+        label='Тип объекта',
+        isGlobal=False,
+        values=values,
+        visibility=[],
+    )
+    return FilterIndex(Model(filters=[filter_], groupCodes=[]))
+
+
+@pytest.fixture
+def store(tmp_path):
+    with TenderStore(str(tmp_path / 'tenders.sqlite'), make_filter_index()) as store:
+        store.upsert([
+            make_tender(1, 'Квартира', 1_000_000),
+            make_tender(2, 'Комната', 500_000),
+            make_tender(3, 'Квартира', 2_000_000),
+        ])
+        yield store
+
+
+def test_query_object_types(store):
+    tenders = store.query(parse_url(f'{URL}&objectTypes={APARTMENT}'))
+    assert [tender.idx for tender in tenders] == [1]
+
+
+def test_query_unknown_code(store):
+    with pytest.raises(UnknownFilterValueError):
+        store.query(parse_url(f'{URL}&objectTypes=nsi:41:999'))
+
+
+def test_query_unsupported_params(store):
+    with pytest.raises(ValueError, match='tender_status'):
+        store.query(parse_url(f'{URL}&tenderStatus=nsi:tender_status_tender_filter:1'))
+
+
+def test_query_without_filter_index(tmp_path):
+    with TenderStore(str(tmp_path / 'tenders.sqlite')) as store:
+        with pytest.raises(ValueError, match='filter_index'):
+            store.query(parse_url(f'{URL}&objectTypes={APARTMENT}'))
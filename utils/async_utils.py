@@ -0,0 +1,159 @@
+import asyncio
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, Dict
+
+import aiohttp
+
+from exceptions import TooManyRequestsError
+from utils.concurrency import HostLimiter, HostThrottle
+from utils.utils import (
+    ENCODING,
+    ERRORS_FOR_RETRY,
+    MAX_RETRIES,
+    check_status_code,
+    get_retry_delay,
+    json_loads,
+)
+
+ASYNC_ERRORS_FOR_RETRY = ERRORS_FOR_RETRY + (
+    aiohttp.ClientConnectionError,
+    asyncio.TimeoutError,
+)
+
+
+def async_wait_for_response(func) -> Any:
+    """
+    Асинхронный аналог wait_for_response. Если передан throttle
+    (AsyncHostThrottle), каждая попытка занимает у него слот, а 503/429
+    с Retry-After приостанавливают запросы всех корутин к хосту
+    """
+
+    async def wrapper(*args, throttle=None, **kwargs) -> Any:
+        delay = 1
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                if throttle is None:
+                    res = await func(*args, **kwargs)
+                else:
+                    async with throttle.slot():
+                        res = await func(*args, **kwargs)
+            except ASYNC_ERRORS_FOR_RETRY as e:
+                if throttle and isinstance(e, TooManyRequestsError):
+                    throttle.on_throttled(e.retry_after)
+                if attempt == MAX_RETRIES:
+                    raise
+                await asyncio.sleep(get_retry_delay(delay, e))
+                delay *= 2
+                continue
+
+            if throttle:
+                throttle.on_success()
+            return res
+
+    return wrapper
+
+
+class AsyncDecodeTo(Enum):
+    TEXT: object = lambda res: res.text(encoding=ENCODING)
+    JSON: object = lambda res: res.json(
+        encoding=ENCODING,
+        content_type=None,
+        loads=json_loads,
+    )
+
+
+@async_wait_for_response
+async def async_get_url(session, method, decoder, url, **kwargs):
+    async with session.request(method.value, url, **kwargs) as res:
+        check_status_code(res.status, res.headers)
+        return await decoder(res)
+
+
+class AsyncHostThrottle(HostThrottle):
+    """
+    HostThrottle для корутин: те же token bucket и AIMD, но слот
+    ожидается в цикле событий, не блокируя поток. Лимиты хоста
+    сохраняются между запусками, событие создается для каждого цикла
+    """
+
+    def __init__(self, max_concurrency: int, max_rate: float):
+        super().__init__(max_concurrency, max_rate)
+        self._loop = None
+        self._changed = None
+
+    @property
+    def changed(self) -> asyncio.Event:
+        # asyncio.Event привязывается к циклу при первом ожидании,
+        # а парсер может запускаться в разных asyncio.run
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._changed = asyncio.Event()
+        return self._changed
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self) -> None:
+        while True:
+            acquired, timeout = self._try_acquire()
+            if acquired:
+                return
+
+            changed = self.changed
+            changed.clear()
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self) -> None:
+        self.active -= 1
+        self.changed.set()
+
+    def on_success(self) -> None:
+        super().on_success()
+        self.changed.set()
+
+
+class AsyncHostLimiter(HostLimiter):
+    """
+    Ограничение числа и частоты запросов к хосту для корутин
+    """
+    throttle_class = AsyncHostThrottle
+
+
+class AsyncInFlightCache:
+    """
+    Асинхронный аналог InFlightCache: одновременные запросы одного ключа
+    ждут одну и ту же задачу
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Any, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def get_or_compute(self, key, coro_func) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_func())
+            self._tasks[key] = task
+
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if self._tasks.get(key) is task:
+                self._tasks.pop(key)
+            raise
+
+    def clear(self) -> None:
+        self._tasks = {}
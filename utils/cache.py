@@ -0,0 +1,415 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from utils.metrics import Metrics, metrics as default_metrics
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+MISSING = object()
+
+DEFAULT_TTL = 30 * 24 * 60 * 60
+DEFAULT_NEGATIVE_TTL = 24 * 60 * 60
+DEFAULT_MAX_SIZE = 100_000
+DEFAULT_MEMORY_SIZE = 10_000
+# Для значений, которые не меняются после публикации (задатки)
+NO_EXPIRY_TTL = 100 * 365 * 24 * 60 * 60
+EVICT_EVERY = 100
+
+
+class BaseCache:
+    """
+    Кэш ключ -> json-совместимое значение с TTL. Значение None используется
+    как отрицательная запись (например, адрес не найден на flatinfo)
+    и живет negative_ttl секунд. get возвращает default, если ключа нет.
+    get(key, stale=True) отдает и просроченную запись, если она еще
+    не вытеснена, например чтобы перепроверить ее условным запросом.
+    get_with_ttl вместе со значением отдает оставшийся срок жизни записи
+    """
+    name = 'base'
+
+    def __init__(
+            self,
+            ttl: float = DEFAULT_TTL,
+            negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+            metrics: Optional[Metrics] = None,
+    ):
+        self.metrics = metrics or default_metrics
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = MISSING, stale: bool = False) -> Any:
+        raise NotImplementedError
+
+    def get_with_ttl(
+            self,
+            key: str,
+            default: Any = MISSING,
+    ) -> Tuple[Any, Optional[float]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def get_ttl(self, value: Any, ttl: Optional[float] = None) -> float:
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        return ttl
+
+    def count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.metrics.inc(
+            'cache_requests_total',
+            cache=self.name,
+            result='hit' if hit else 'miss',
+        )
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self),
+        }
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class MemoryCache(BaseCache):
+    """
+    LRU-кэш в памяти процесса, не больше max_size записей
+    """
+    name = 'memory'
+
+    def __init__(
+            self,
+            max_size: int = DEFAULT_MEMORY_SIZE,
+            ttl: float = DEFAULT_TTL,
+            negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+            metrics: Optional[Metrics] = None,
+    ):
+        super().__init__(ttl, negative_ttl, metrics)
+        self.max_size = max_size
+        self._lock = Lock()
+        self._data = OrderedDict()
+
+    def get(self, key: str, default: Any = MISSING, stale: bool = False) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            hit = item is not None and (stale or item[1] >= time.time())
+            if hit:
+                self._data.move_to_end(key)
+        if not stale:
+            self.count(hit)
+        return item[0] if hit else default
+
+    def get_with_ttl(
+            self,
+            key: str,
+            default: Any = MISSING,
+    ) -> Tuple[Any, Optional[float]]:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            hit = item is not None and item[1] >= now
+            if hit:
+                self._data.move_to_end(key)
+        self.count(hit)
+        return (item[0], item[1] - now) if hit else (default, None)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + self.get_ttl(value, ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache(BaseCache):
+    """
+    Общий кэш для нескольких процессов и хостов в Redis. Значения хранятся
+    в json, срок жизни задается ttl ключа, поэтому просроченных записей
+    (stale) в Redis нет
+    """
+    name = 'redis'
+
+    def __init__(
+            self,
+            url: str = 'redis://localhost:6379/0',
+            prefix: str = 'house_parser:',
+            ttl: float = DEFAULT_TTL,
+            negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+            client=None,
+            metrics: Optional[Metrics] = None,
+    ):
+        """
+        client - готовый клиент redis.Redis, иначе создается по url
+        """
+        super().__init__(ttl, negative_ttl, metrics)
+        if client is None:
+            if redis is None:
+                raise ImportError('Для RedisCache установите redis')
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str, default: Any = MISSING, stale: bool = False) -> Any:
+        value = self.client.get(self.prefix + key)
+        if not stale:
+            self.count(value is not None)
+        if value is None:
+            return default
+        return json.loads(value)
+
+    def get_with_ttl(
+            self,
+            key: str,
+            default: Any = MISSING,
+    ) -> Tuple[Any, Optional[float]]:
+        pipe = self.client.pipeline()
+        pipe.get(self.prefix + key)
+        pipe.pttl(self.prefix + key)
+        value, pttl = pipe.execute()
+        self.count(value is not None)
+        if value is None:
+            return default, None
+        # pttl < 0 - у ключа нет срока жизни
+        return json.loads(value), pttl / 1000 if pttl >= 0 else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.client.set(
+            self.prefix + key,
+            json.dumps(value, ensure_ascii=False),
+            px=int(self.get_ttl(value, ttl) * 1000),
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(f'{self.prefix}*'))
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class SqliteCache(BaseCache):
+    """
+    Постоянный кэш в SQLite с TTL и LRU-вытеснением. Файл можно
+    разделить между процессами одного хоста
+    """
+    name = 'persistent'
+
+    def __init__(
+            self,
+            path: str = 'flatinfo_cache.sqlite',
+            ttl: float = DEFAULT_TTL,
+            negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+            max_size: int = DEFAULT_MAX_SIZE,
+            metrics: Optional[Metrics] = None,
+    ):
+        super().__init__(ttl, negative_ttl, metrics)
+        self.path = path
+        self.max_size = max_size
+
+        self._writes = 0
+        self._lock = Lock()
+
+        self._conn = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, '
+            'value TEXT, '
+            'expires_at REAL, '
+            'accessed_at REAL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS cache_accessed_at '
+            'ON cache (accessed_at)'
+        )
+
+    def get(self, key: str, default: Any = MISSING, stale: bool = False) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM cache WHERE key = ?',
+                (key,),
+            ).fetchone()
+
+            hit = row is not None and (stale or row[1] >= now)
+            if hit:
+                self._conn.execute(
+                    'UPDATE cache SET accessed_at = ? WHERE key = ?',
+                    (now, key),
+                )
+
+        if not stale:
+            self.count(hit)
+        return json.loads(row[0]) if hit else default
+
+    def get_with_ttl(
+            self,
+            key: str,
+            default: Any = MISSING,
+    ) -> Tuple[Any, Optional[float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM cache WHERE key = ?',
+                (key,),
+            ).fetchone()
+
+            hit = row is not None and row[1] >= now
+            if hit:
+                self._conn.execute(
+                    'UPDATE cache SET accessed_at = ? WHERE key = ?',
+                    (now, key),
+                )
+
+        self.count(hit)
+        return (json.loads(row[0]), row[1] - now) if hit else (default, None)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.get_ttl(value, ttl)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache '
+                '(key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), now + ttl, now),
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def purge_expired(self) -> None:
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM cache WHERE expires_at < ?',
+                (time.time(),),
+            )
+
+    def _evict(self) -> None:
+        size = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        excess = size - self.max_size
+        if excess <= 0:
+            return
+
+        self._conn.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed_at LIMIT ?)',
+            (excess,),
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM cache'
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._evict()
+            self._conn.close()
+
+
+class TieredCache(BaseCache):
+    """
+    Локальный уровень (обычно MemoryCache) перед общим (RedisCache или
+    SqliteCache на общем файле). Найденное в общем уровне копируется
+    в локальный с оставшимся сроком жизни, запись идет в оба уровня
+    """
+    name = 'tiered'
+
+    def __init__(self, local: BaseCache, shared: BaseCache):
+        super().__init__(shared.ttl, shared.negative_ttl, shared.metrics)
+        self.local = local
+        self.shared = shared
+
+    def get(self, key: str, default: Any = MISSING, stale: bool = False) -> Any:
+        if not stale:
+            return self.get_with_ttl(key, default)[0]
+
+        # Просроченная запись не должна стать свежей в локальном уровне
+        value = self.local.get(key, stale=True)
+        if value is MISSING:
+            value = self.shared.get(key, stale=True)
+        return default if value is MISSING else value
+
+    def get_with_ttl(
+            self,
+            key: str,
+            default: Any = MISSING,
+    ) -> Tuple[Any, Optional[float]]:
+        value, ttl = self.local.get_with_ttl(key)
+        if value is MISSING:
+            value, ttl = self.shared.get_with_ttl(key)
+            if value is not MISSING:
+                self.local.set(key, value, ttl)
+
+        self.count(value is not MISSING)
+        return (default, None) if value is MISSING else (value, ttl)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        # Срок жизни задает общий уровень, иначе локальный подставит свой
+        ttl = self.get_ttl(value, ttl)
+        self.local.set(key, value, ttl)
+        self.shared.set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def __len__(self) -> int:
+        return len(self.shared)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            'local': self.local.stats(),
+            'shared': self.shared.stats(),
+        }
+
+    def close(self) -> None:
+        self.local.close()
+        self.shared.close()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from models.filter_models import FilterParams
+from utils.export import tender_to_row
+
+
+def checkpoint_key(params: FilterParams) -> str:
+    """
+    Ключ журнала по параметрам фильтра без номера и размера страницы
+    """
+    data = json.dumps(
+        params.dict(
+            by_alias=True,
+            exclude_none=True,
+            exclude={'page_number', 'page_size'},
+        ),
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+class Checkpoint:
+    """
+    Журнал запуска в JSONL: размер выдачи, загруженные страницы
+    и обогащенные тендеры. Записи дописываются по ходу запуска,
+    поэтому после сбоя запуск продолжается без повторных запросов.
+    В памяти во время запуска хранятся только номера страниц и id
+    тендеров, сами страницы и тендеры (pages, tenders) - только
+    прочитанные из журнала при resume
+    """
+
+    def __init__(self, path: str, resume: bool = True):
+        """
+        resume - загрузить существующий журнал, иначе начать заново
+        """
+        self.path = path
+        self.total_count: Optional[int] = None
+        self.page_size: Optional[int] = None
+        self.pages: Dict[int, dict] = {}
+        self.tenders: Dict[int, dict] = {}
+        self.page_numbers: Set[int] = set()
+        self.tender_ids: Set[int] = set()
+
+        if resume and os.path.exists(path):
+            self.load()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    @property
+    def is_started(self) -> bool:
+        return self.total_count is not None
+
+    def load(self) -> None:
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла не дописаться при сбое
+                    continue
+                self.apply(record, keep_data=True)
+
+    def apply(self, record: dict, keep_data: bool = False) -> None:
+        """
+        keep_data - сохранить в памяти страницу или тендер записи
+        """
+        kind = record.get('type')
+        if kind == 'start':
+            self.total_count = record['total_count']
+            self.page_size = record['page_size']
+        elif kind == 'page':
+            self.page_numbers.add(record['number'])
+            if keep_data:
+                self.pages[record['number']] = record['page']
+        elif kind == 'tender':
+            self.tender_ids.add(record['tender']['idx'])
+            if keep_data:
+                self.tenders[record['tender']['idx']] = record['tender']
+
+    def start(self, total_count: int, page_size: int) -> None:
+        self.write({
+            'type': 'start',
+            'total_count': total_count,
+            'page_size': page_size,
+        })
+
+    def add_page(self, number: int, page: dict) -> None:
+        self.write({'type': 'page', 'number': number, 'page': page})
+
+    def add_tender(self, tender) -> None:
+        self.write({'type': 'tender', 'tender': tender_to_row(tender)})
+
+    def write(self, record: dict) -> None:
+        self.apply(record)
+        self._file.write(
+            json.dumps(record, ensure_ascii=False, default=datetime.isoformat)
+            + '\n'
+        )
+        self._file.flush()
+
+    def finish(self) -> None:
+        """
+        Запуск завершен, журнал больше не нужен
+        """
+        self.close()
+        os.remove(self.path)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
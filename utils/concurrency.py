@@ -0,0 +1,218 @@
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from threading import Condition, Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from utils.metrics import Metrics, metrics as default_metrics
+
+DEFAULT_HOST_LIMITS = {
+    'api.investmoscow.ru': 4,
+    'flatinfo.ru': 4,
+}
+DEFAULT_HOST_LIMIT = 4
+
+# Запросов в секунду, до которых разгоняется хост без 503/429
+DEFAULT_HOST_RATES = {
+    'api.investmoscow.ru': 10,
+    'flatinfo.ru': 10,
+}
+DEFAULT_HOST_RATE = 10
+MIN_RATE = 0.5
+RATE_INCREASE = 0.1
+DECREASE_FACTOR = 0.5
+# Несколько 503 подряд от разных потоков считаются одним событием
+DECREASE_INTERVAL = 1
+
+
+class HostThrottle:
+    """
+    Token bucket и AIMD-ограничение одновременных запросов для одного хоста.
+    При 503/429 лимиты уменьшаются вдвое и хост ставится на паузу
+    (Retry-After), при успешных ответах медленно растут до максимума
+    """
+
+    def __init__(self, max_concurrency: int, max_rate: float):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_rate = max(max_rate, MIN_RATE)
+        self.concurrency = float(self.max_concurrency)
+        self.rate = float(self.max_rate)
+
+        self.active = 0
+        self.tokens = 1.0
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+        self._cond = Condition()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                acquired, timeout = self._try_acquire()
+                if acquired:
+                    return
+                self._cond.wait(timeout)
+
+    def _try_acquire(self) -> Tuple[bool, Optional[float]]:
+        """
+        Занимает слот, если это разрешают лимиты. Иначе возвращает, сколько
+        ждать до следующей проверки (None - до освобождения слота)
+        """
+        now = time.monotonic()
+        self._refill(now)
+
+        timeout = self.paused_until - now
+        if timeout <= 0 and self.active < int(self.concurrency):
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.active += 1
+                return True, None
+            timeout = (1 - self.tokens) / self.rate
+
+        return False, timeout if timeout > 0 else None
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self.concurrency = min(
+                self.max_concurrency,
+                self.concurrency + 1 / self.concurrency,
+            )
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+            self._cond.notify_all()
+
+    def on_throttled(self, retry_after: Optional[float] = None) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+            if now - self.decreased_at >= DECREASE_INTERVAL:
+                self.decreased_at = now
+                self.concurrency = max(1.0, self.concurrency * DECREASE_FACTOR)
+                self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+
+    def _refill(self, now: float) -> None:
+        capacity = max(1.0, self.rate)
+        self.tokens = min(
+            capacity,
+            self.tokens + (now - self.updated_at) * self.rate,
+        )
+        self.updated_at = now
+
+
+class HostLimiter:
+    """
+    Ограничивает количество одновременных запросов и частоту запросов
+    к каждому хосту
+    """
+    throttle_class = HostThrottle
+
+    def __init__(
+            self,
+            limits: Optional[Dict[str, int]] = None,
+            default: int = DEFAULT_HOST_LIMIT,
+            rates: Optional[Dict[str, float]] = None,
+            default_rate: float = DEFAULT_HOST_RATE,
+    ):
+        self.limits = dict(DEFAULT_HOST_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.default = default
+
+        self.rates = dict(DEFAULT_HOST_RATES)
+        if rates:
+            self.rates.update(rates)
+        self.default_rate = default_rate
+
+        self._throttles = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        return urlparse(url).hostname or ''
+
+    def get_throttle(self, url: str) -> HostThrottle:
+        host = self.get_host(url)
+        with self._lock:
+            throttle = self._throttles.get(host)
+            if throttle is None:
+                throttle = self.throttle_class(
+                    self.limits.get(host, self.default),
+                    self.rates.get(host, self.default_rate),
+                )
+                self._throttles[host] = throttle
+            return throttle
+
+    def hold(self, url: str):
+        return self.get_throttle(url).slot()
+
+
+class InFlightCache:
+    """
+    Кэш, который не дает двум потокам вычислять одно и то же значение:
+    второй поток ждет результат первого
+    """
+
+    def __init__(self, name: str = '', metrics: Optional[Metrics] = None):
+        self.name = name
+        self.metrics = metrics or default_metrics
+        self.hits = 0
+        self.misses = 0
+        self._futures: Dict[Any, Future] = {}
+        self._lock = Lock()
+
+    def __contains__(self, key) -> bool:
+        future = self._futures.get(key)
+        return future is not None and future.done() \
+            and future.exception() is None
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+    def get_or_compute(self, key, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._futures[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        self.metrics.inc(
+            'cache_requests_total',
+            cache=self.name,
+            result='miss' if owner else 'hit',
+        )
+        if not owner:
+            return future.result()
+
+        try:
+            value = func()
+        except BaseException as e:
+            with self._lock:
+                self._futures.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        future.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._futures = {}
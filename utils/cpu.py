@@ -0,0 +1,45 @@
+from typing import Iterator, List, Optional
+
+from models.models import FlatInfo, InvestInfo
+
+# CPU-нагруженные этапы, которые можно выполнять в отдельных процессах.
+# Функции объявлены на уровне модуля, чтобы их можно было передать
+# в ProcessPoolExecutor. bs4 загружается только при разборе первой
+# страницы flatinfo
+
+
+def parse_flatinfo_page(text_page: str, url: str) -> FlatInfo:
+    from utils.html_parser import HtmlParser
+
+    page = HtmlParser(text_page)
+    page_dict = page.parse()
+    flat_info = FlatInfo.parse_obj(page_dict)
+    flat_info.flatinfo_url = url
+    return flat_info
+
+
+def parse_invest(tender: dict, strict: bool = False) -> InvestInfo:
+    """
+    strict - полная валидация pydantic, иначе InvestInfo.from_raw
+    """
+    if strict:
+        return InvestInfo.parse_obj(tender)
+    return InvestInfo.from_raw(tender)
+
+
+def parse_invest_batch(
+        tenders: List[dict],
+        strict: bool = False,
+) -> List[Optional[InvestInfo]]:
+    invest_infos = []
+    for tender in tenders:
+        try:
+            invest_infos.append(parse_invest(tender, strict))
+        except (Exception,):
+            invest_infos.append(None)
+    return invest_infos
+
+
+def chunked(items: list, size: int) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,185 @@
+import csv
+import json
+import os
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from models.models import Tender
+
+TENDER_FIELDS = tuple(Tender.__fields__)
+DEFAULT_BATCH_SIZE = 1000
+
+
+def tender_to_row(tender: Tender) -> dict:
+    return {field: getattr(tender, field, None) for field in TENDER_FIELDS}
+
+
+def to_local_datetime(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Даты тендеров уже сдвинуты на московское время (InvestInfo.add_three_hours),
+    поэтому tzinfo отбрасывается, а не переводится
+    """
+    if value is None:
+        return None
+    return value.replace(tzinfo=None)
+
+
+class BaseWriter:
+    """
+    Пишет тендеры пачками по batch_size, в памяти хранится только одна пачка
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self._batch: List[Tender] = []
+
+    def write(self, tender: Tender) -> None:
+        self._batch.append(tender)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_all(self, tenders: Iterable[Tender]) -> int:
+        for tender in tenders:
+            self.write(tender)
+        self.flush()
+        return self.count
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        self.write_batch(self._batch)
+        self.count += len(self._batch)
+        self._batch = []
+
+    def write_batch(self, tenders: List[Tender]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class JsonlWriter(BaseWriter):
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(path, batch_size)
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write_batch(self, tenders: List[Tender]) -> None:
+        lines = [
+            json.dumps(
+                tender_to_row(tender),
+                ensure_ascii=False,
+                default=datetime.isoformat,
+            )
+            for tender in tenders
+        ]
+        self._file.write('\n'.join(lines) + '\n')
+
+    def close(self) -> None:
+        super().close()
+        self._file.close()
+
+
+class CsvWriter(BaseWriter):
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(path, batch_size)
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=TENDER_FIELDS)
+        self._writer.writeheader()
+
+    def write_batch(self, tenders: List[Tender]) -> None:
+        self._writer.writerows(tender_to_row(tender) for tender in tenders)
+
+    def close(self) -> None:
+        super().close()
+        self._file.close()
+
+
+def import_pyarrow():
+    """
+    pyarrow загружается только при записи parquet
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Для записи parquet установите pyarrow')
+    return pyarrow
+
+
+def get_arrow_schema():
+    pyarrow = import_pyarrow()
+    types = {
+        int: pyarrow.int64(),
+        float: pyarrow.float64(),
+        str: pyarrow.string(),
+        datetime: pyarrow.timestamp('us'),
+    }
+    return pyarrow.schema([
+        pyarrow.field(
+            name,
+            types[field.type_],
+            nullable=not field.required,
+        )
+        for name, field in Tender.__fields__.items()
+    ])
+
+
+class ParquetWriter(BaseWriter):
+    """
+    Каждая пачка записывается отдельной row group
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE * 10):
+        pyarrow = import_pyarrow()
+        super().__init__(path, batch_size)
+        self.schema = get_arrow_schema()
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_batch(self, tenders: List[Tender]) -> None:
+        pyarrow = import_pyarrow()
+        columns = {}
+        for name in TENDER_FIELDS:
+            values = [getattr(tender, name, None) for tender in tenders]
+            if self.schema.field(name).type == pyarrow.timestamp('us'):
+                values = [to_local_datetime(value) for value in values]
+            columns[name] = values
+
+        table = pyarrow.Table.from_pydict(columns, schema=self.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        super().close()
+        self._writer.close()
+
+
+WRITERS = {
+    '.jsonl': JsonlWriter,
+    '.csv': CsvWriter,
+    '.parquet': ParquetWriter,
+}
+
+
+def export_tenders(
+        tenders: Iterable[Tender],
+        path: str,
+        batch_size: Optional[int] = None,
+) -> int:
+    """
+    Записывает тендеры в файл, формат определяется по расширению
+    """
+    extension = os.path.splitext(path)[1].lower()
+    writer_class = WRITERS.get(extension)
+    if writer_class is None:
+        raise ValueError(f'Неизвестный формат файла: {path}')
+
+    kwargs = {'batch_size': batch_size} if batch_size else {}
+    with writer_class(path, **kwargs) as writer:
+        return writer.write_all(tenders)
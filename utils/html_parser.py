@@ -1,10 +1,16 @@
 from copy import deepcopy
 from typing import Optional, Dict
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 from utils.utils import convert_to_meters
 
+try:
+    import lxml  # noqa: F401
+    PARSER_FEATURES = 'lxml'
+except ImportError:
+    PARSER_FEATURES = 'html.parser'
+
 SEARCH_VALUES = {
     'Год постройки': 'building_year',
     'Округ': 'district',
@@ -26,9 +32,36 @@ class TagClasses:
     METRO_LABEL = 'metro-label'
 
 
+PARSE_ONLY_CLASSES = {TagClasses.ROW, TagClasses.METRO}
+
+
+def has_parse_only_class(class_: Optional[str]) -> bool:
+    # Список классов в SoupStrainer сравнивается со всем атрибутом class,
+    # поэтому элементы с несколькими классами проверяются по отдельности
+    return bool(class_) and bool(PARSE_ONLY_CLASSES & set(class_.split()))
+
+
+# Дерево строится только для строк таблиц и блока метро, остальная
+# страница пропускается
+PARSE_ONLY = SoupStrainer(class_=has_parse_only_class)
+
+
 class HtmlParserBase:
-    def __init__(self, html: str):
-        self.soup = BeautifulSoup(html, 'html.parser')
+    def __init__(
+            self,
+            html: str,
+            features: str = PARSER_FEATURES,
+            parse_only: Optional[SoupStrainer] = PARSE_ONLY,
+    ):
+        """
+        features и parse_only заданы для быстрого разбора, без них
+        (features='html.parser', parse_only=None) строится вся страница
+        """
+        self.soup = BeautifulSoup(
+            html,
+            features,
+            parse_only=parse_only,
+        )
         self.search_dict = deepcopy(SEARCH_VALUES)
         self.result_dict = {}
 
@@ -108,9 +141,6 @@ class HtmlParserBase:
 
 
 class HtmlParser(HtmlParserBase):
-    def __init__(self, html: str):
-        super().__init__(html)
-
     def parse(self) -> Dict:
         self.parse_tables()
         self.parse_metro()
@@ -125,6 +155,8 @@ class HtmlParser(HtmlParserBase):
             return
 
         for row in rows:
+            if not self.search_dict:
+                break
             self.parse_row(row)
 
     def parse_metro(self) -> None:
@@ -0,0 +1,241 @@
+import cProfile
+import json
+import pstats
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from io import StringIO
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def make_labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def format_labels(labels: Labels, extra: Optional[dict] = None) -> str:
+    items = list(labels)
+    if extra:
+        items.extend(extra.items())
+    if not items:
+        return ''
+    text = ','.join(f'{key}="{value}"' for key, value in items)
+    return f'{{{text}}}'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep_samples: bool = False):
+        """
+        keep_samples - хранить все значения для точных перцентилей,
+        иначе перцентили оцениваются по корзинам
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: Optional[List[float]] = [] if keep_samples else None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.samples is not None:
+            self.samples.append(value)
+
+    def percentile(self, percent: float) -> float:
+        if self.samples is not None:
+            return percentile(self.samples, percent)
+        if not self.count:
+            return 0.0
+
+        # Линейная интерполяция внутри корзины, как histogram_quantile
+        rank = percent / 100 * self.count
+        total, lower = 0, 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and total + count >= rank:
+                return lower + (bound - lower) * (rank - total) / count
+            total += count
+            lower = bound
+        return self.buckets[-1]
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metrics:
+    """
+    Счетчики, гистограммы и профили этапов парсера.
+    Выгружается в формате Prometheus (to_prometheus) или json (report)
+    """
+
+    def __init__(self, keep_samples: bool = False):
+        """
+        keep_samples - хранить значения гистограмм для точных перцентилей
+        (для бенчмарков, в долгих запусках память растет)
+        """
+        self.keep_samples = keep_samples
+        self._lock = Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.profiles: Dict[str, pstats.Stats] = {}
+        self._profile_lock = Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = make_labels(labels)
+        with self._lock:
+            counter = self.counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = make_labels(labels)
+        with self._lock:
+            histogram = self.histograms.setdefault(name, {})
+            if key not in histogram:
+                histogram[key] = Histogram(keep_samples=self.keep_samples)
+            histogram[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def profile(self, stage: str):
+        """
+        Профилирует блок через cProfile, профили одного этапа суммируются.
+        Одновременно активен один профилировщик: вложенный этап входит
+        в профиль внешнего, а этапы других потоков в это время
+        не профилируются (profiles_skipped_total)
+        """
+        profiler = self._start_profiler()
+        if profiler is None:
+            self.inc('profiles_skipped_total', stage=stage)
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._profile_lock.release()
+            with self._lock:
+                stats = self.profiles.get(stage)
+                if stats is None:
+                    self.profiles[stage] = pstats.Stats(profiler)
+                else:
+                    stats.add(profiler)
+
+    def _start_profiler(self) -> Optional[cProfile.Profile]:
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: уже активен другой профилировщик
+            self._profile_lock.release()
+            return None
+        return profiler
+
+    def get_profile_text(self, stage: str, limit: int = 30) -> str:
+        stream = StringIO()
+        stats = self.profiles[stage]
+        stats.stream = stream
+        stats.sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def dump_profile(self, stage: str, path: str) -> None:
+        self.profiles[stage].dump_stats(path)
+
+    def get_counter(self, name: str, **labels) -> float:
+        return self.counters.get(name, {}).get(make_labels(labels), 0)
+
+    def get_histograms(self, name: str) -> Dict[Labels, Histogram]:
+        with self._lock:
+            return dict(self.histograms.get(name, {}))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.profiles = {}
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, values in sorted(self.counters.items()):
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in sorted(values.items()):
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+
+            for name, values in sorted(self.histograms.items()):
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(values.items()):
+                    for bound, count in histogram.cumulative():
+                        bucket_labels = format_labels(labels, {'le': bound})
+                        lines.append(f'{name}_bucket{bucket_labels} {count}')
+                    lines.append(
+                        f'{name}_sum{format_labels(labels)} {histogram.sum}'
+                    )
+                    lines.append(
+                        f'{name}_count{format_labels(labels)} {histogram.count}'
+                    )
+
+        return '\n'.join(lines) + '\n'
+
+    def report(self) -> dict:
+        with self._lock:
+            counters = {
+                name: [
+                    {'labels': dict(labels), 'value': value}
+                    for labels, value in sorted(values.items())
+                ]
+                for name, values in sorted(self.counters.items())
+            }
+            histograms = {
+                name: [
+                    {
+                        'labels': dict(labels),
+                        'count': histogram.count,
+                        'sum': round(histogram.sum, 6),
+                        'avg': round(histogram.sum / histogram.count, 6)
+                        if histogram.count else 0,
+                        'p50': round(histogram.percentile(50), 6),
+                        'p99': round(histogram.percentile(99), 6),
+                    }
+                    for labels, histogram in sorted(values.items())
+                ]
+                for name, values in sorted(self.histograms.items())
+            }
+        return {
+            'counters': counters,
+            'histograms': histograms,
+            'profiles': sorted(self.profiles),
+        }
+
+    def write_report(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+metrics = Metrics()
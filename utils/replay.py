@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import random
+import time
+from threading import Lock
+from typing import Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from exceptions import ReplayMissError
+
+
+def request_key(method: str, url: str, params=None, json_data=None) -> str:
+    data = json.dumps(
+        [method.upper(), url, params, json_data],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+class HttpArchive:
+    """
+    Каталог с записанными ответами: один json-файл на запрос
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.json')
+
+    def load(self, key: str) -> Optional[dict]:
+        path = self.get_path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, key: str, entry: dict) -> None:
+        path = self.get_path(key)
+        with self._lock:
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(f'{path}.tmp', path)
+
+
+class RecordingSession(requests.Session):
+    """
+    Выполняет реальные запросы и сохраняет ответы в архив
+    """
+
+    def __init__(self, archive: HttpArchive):
+        super().__init__()
+        self.archive = archive
+
+    def request(self, method, url, params=None, json=None, **kwargs):
+        res = super().request(method, url, params=params, json=json, **kwargs)
+        # Ключ записи не учитывает заголовки, поэтому ответы на условные
+        # запросы (304) не сохраняются
+        if res.status_code in (304, 503):
+            return res
+
+        entry = {
+            'method': method.upper(),
+            'url': url,
+            'params': params,
+            'json': json,
+            'status_code': res.status_code,
+            'headers': dict(res.headers),
+            'body': res.content.decode('utf-8', errors='replace'),
+        }
+        self.archive.save(request_key(method, url, params, json), entry)
+        return res
+
+
+class ReplaySession(requests.Session):
+    """
+    Отдает ответы из архива без сети. latency - имитация задержки ответа
+    в секундах, error_rate - доля ответов 503
+    """
+
+    def __init__(
+            self,
+            archive: HttpArchive,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            error_rate: float = 0.0,
+            seed: Optional[int] = None,
+    ):
+        super().__init__()
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.requests_count = 0
+        self.errors_count = 0
+        self._lock = Lock()
+
+    def request(self, method, url, params=None, json=None, **kwargs):
+        with self._lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            is_error = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+
+        if is_error:
+            res = self.build_response(url, {'status_code': 503, 'body': ''})
+        else:
+            entry = self.archive.load(request_key(method, url, params, json))
+            if entry is None:
+                raise ReplayMissError(f'{method} {url} {params} {json}')
+            res = self.build_response(url, entry)
+
+        with self._lock:
+            self.requests_count += 1
+            self.errors_count += is_error
+        return res
+
+    @staticmethod
+    def build_response(url: str, entry: dict) -> requests.Response:
+        res = requests.Response()
+        res.url = url
+        res.status_code = entry['status_code']
+        res.headers = CaseInsensitiveDict(entry.get('headers') or {})
+        res.headers.pop('Content-Encoding', None)
+        res._content = entry['body'].encode('utf-8')
+        res.encoding = 'utf-8'
+        return res
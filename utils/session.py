@@ -0,0 +1,80 @@
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from utils.concurrency import DEFAULT_HOST_LIMITS
+
+DEFAULT_POOL_SIZE = 10
+# br добавляется urllib3 только если установлен brotli
+DEFAULT_HEADERS = {
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+}
+
+
+class SessionPool:
+    """
+    Постоянная сессия requests с пулом keep-alive соединений для каждого хоста.
+    Один пул можно передавать нескольким парсерам
+    """
+
+    def __init__(
+            self,
+            pool_sizes: Optional[Dict[str, int]] = None,
+            default_pool_size: int = DEFAULT_POOL_SIZE,
+            session_factory: Callable[[], requests.Session] = requests.Session,
+    ):
+        """
+        session_factory - класс или функция, создающая сессию, например
+            RecordingSession/ReplaySession из utils.replay
+        """
+        self.session_factory = session_factory
+        self.pool_sizes = dict(DEFAULT_HOST_LIMITS)
+        if pool_sizes:
+            self.pool_sizes.update(pool_sizes)
+        self.default_pool_size = default_pool_size
+        self._session = None
+        self._lock = Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                self._session = self.create_session()
+            return self._session
+
+    def create_session(self) -> requests.Session:
+        session = self.session_factory()
+        session.headers.update(DEFAULT_HEADERS)
+
+        default_adapter = HTTPAdapter(
+            pool_connections=len(self.pool_sizes) or 1,
+            pool_maxsize=self.default_pool_size,
+        )
+        session.mount('http://', default_adapter)
+        session.mount('https://', default_adapter)
+
+        for host, size in self.pool_sizes.items():
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=max(size, 1),
+            )
+            session.mount(f'https://{host}/', adapter)
+            session.mount(f'http://{host}/', adapter)
+
+        return session
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
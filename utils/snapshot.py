@@ -0,0 +1,88 @@
+import hashlib
+import json
+import sqlite3
+import time
+from threading import Lock
+from typing import Iterable, Optional, Set
+
+from models.models import Tender
+
+SNAPSHOT_FIELDS = (
+    'startPrice',
+    'pricePerSquare',
+    'requestEndDate',
+    'tenderDate',
+    'tenderStatus',
+)
+
+
+def tender_hash(raw_tender: dict) -> str:
+    values = [raw_tender.get(field) for field in SNAPSHOT_FIELDS]
+    data = json.dumps(values, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+class SnapshotStore:
+    """
+    Последний обработанный снимок тендеров для инкрементального парсинга.
+    Один файл хранит результаты одного фильтра: id, которых нет в новой
+    выдаче, считаются снятыми
+    """
+
+    def __init__(self, path: str = 'snapshot.sqlite'):
+        self.path = path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS snapshot ('
+            'id INTEGER PRIMARY KEY, '
+            'hash TEXT, '
+            'tender TEXT, '
+            'updated_at REAL)'
+        )
+
+    def get(self, tender_id: int, hash_: str) -> Optional[Tender]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT tender FROM snapshot WHERE id = ? AND hash = ?',
+                (tender_id, hash_),
+            ).fetchone()
+
+        if row is None:
+            return None
+        return Tender.parse_raw(row[0])
+
+    def put(self, tender_id: int, hash_: str, tender: Tender) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO snapshot '
+                '(id, hash, tender, updated_at) VALUES (?, ?, ?, ?)',
+                (tender_id, hash_, tender.json(), time.time()),
+            )
+
+    def ids(self) -> Set[int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT id FROM snapshot').fetchall()
+        return {row[0] for row in rows}
+
+    def remove(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                'DELETE FROM snapshot WHERE id = ?',
+                [(tender_id,) for tender_id in ids],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,279 @@
+import sqlite3
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Iterable, List, Optional, Tuple
+
+from models.create_filter_models import FilterIndex
+from models.filter_models import FilterParams, Range
+from models.models import Tender
+from utils.export import TENDER_FIELDS, to_local_datetime
+
+INDEXED_FIELDS = (
+    'price',
+    'price_per_square_meter',
+    'accepting_end_date',
+    'district',
+    'metro_station',
+)
+SQL_TYPES = {
+    int: 'INTEGER',
+    float: 'REAL',
+    str: 'TEXT',
+    datetime: 'TEXT',
+}
+# Поля FilterParams с диапазонами -> колонка в таблице
+RANGE_FILTERS = {
+    'price': 'price',
+    'area': 'square_meters',
+    'area_apartment': 'square_meters',
+    'area_room': 'square_meters',
+    'area_no_living': 'square_meters',
+    'floor': 'floor',
+    'floor_apartment': 'floor',
+    'floor_room': 'floor',
+    'number_floors': 'floors_number',
+    'number_floors_apartment': 'floors_number',
+    'number_floors_room': 'floors_number',
+}
+# Поля FilterParams с кодами справочника -> колонки с названиями значений
+LABEL_FILTERS = {
+    'object_types': ('realty_type',),
+    'districts': ('district', 'region'),
+    'subway_stations': ('metro_station',),
+}
+# Поля FilterParams, которые не отбирают тендеры
+IGNORED_PARAMS = ('page_number', 'page_size', 'order_by', 'order_asc')
+ORDER_FIELDS = {
+    'RequestEndDate': 'accepting_end_date',
+    'TenderDate': 'trading_date',
+    'StartPrice': 'price',
+    'Price': 'price',
+}
+# Дополнительные условия query: имя аргумента -> (колонка, оператор)
+EXTRA_FILTERS = {
+    'district': ('district', '='),
+    'region': ('region', '='),
+    'metro_station': ('metro_station', '='),
+    'metro_color': ('metro_color', '='),
+    'max_metro_distance': ('metro_distance', '<='),
+    'max_price_per_square_meter': ('price_per_square_meter', '<='),
+    'min_building_year': ('building_year', '>='),
+    'ending_after': ('accepting_end_date', '>='),
+    'ending_before': ('accepting_end_date', '<='),
+}
+
+
+def to_sql_value(value):
+    if isinstance(value, datetime):
+        return to_local_datetime(value).isoformat()
+    return value
+
+
+def parse_range_value(value: Optional[str]) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+class TenderStore:
+    """
+    Локальное хранилище тендеров в SQLite с историей цен.
+    Тендеры обновляются по idx, запросы принимают FilterParams
+    """
+
+    def __init__(
+            self,
+            path: str = 'tenders.sqlite',
+            filter_index: Optional[FilterIndex] = None,
+    ):
+        """
+        filter_index - справочник фильтров, по которому коды FilterParams
+        (типы объектов, районы, станции метро) переводятся в названия
+        """
+        self.path = path
+        self.filter_index = filter_index
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self.create_tables()
+
+    def create_tables(self) -> None:
+        columns = [
+            f'{name} {SQL_TYPES[field.type_]}'
+            + (' PRIMARY KEY' if name == 'idx' else '')
+            for name, field in Tender.__fields__.items()
+        ]
+        columns += ['first_seen_at REAL', 'updated_at REAL']
+
+        with self._conn:
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS tenders ({", ".join(columns)})'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS price_history ('
+                'idx INTEGER, '
+                'price INTEGER, '
+                'recorded_at REAL)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS price_history_idx '
+                'ON price_history (idx, recorded_at)'
+            )
+            for name in INDEXED_FIELDS:
+                self._conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS tenders_{name} '
+                    f'ON tenders ({name})'
+                )
+
+    def upsert(self, tenders: Iterable[Tender]) -> int:
+        now = time.time()
+        fields = ', '.join(TENDER_FIELDS)
+        placeholders = ', '.join('?' for _ in TENDER_FIELDS)
+        updates = ', '.join(
+            f'{name} = excluded.{name}'
+            for name in TENDER_FIELDS if name != 'idx'
+        )
+
+        count = 0
+        with self._lock, self._conn:
+            for tender in tenders:
+                row = [to_sql_value(getattr(tender, name, None))
+                       for name in TENDER_FIELDS]
+                self.add_price(tender.idx, tender.price, now)
+                self._conn.execute(
+                    f'INSERT INTO tenders ({fields}, first_seen_at, updated_at) '
+                    f'VALUES ({placeholders}, ?, ?) '
+                    f'ON CONFLICT(idx) DO UPDATE SET {updates}, '
+                    f'updated_at = excluded.updated_at',
+                    row + [now, now],
+                )
+                count += 1
+        return count
+
+    def add_price(self, idx: int, price: Optional[int], now: float) -> None:
+        last = self._conn.execute(
+            'SELECT price FROM price_history WHERE idx = ? '
+            'ORDER BY recorded_at DESC LIMIT 1',
+            (idx,),
+        ).fetchone()
+        if last is not None and last[0] == price:
+            return
+
+        self._conn.execute(
+            'INSERT INTO price_history (idx, price, recorded_at) '
+            'VALUES (?, ?, ?)',
+            (idx, price, now),
+        )
+
+    def get_price_history(self, idx: int) -> List[Tuple[int, datetime]]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT price, recorded_at FROM price_history '
+                'WHERE idx = ? ORDER BY recorded_at',
+                (idx,),
+            ).fetchall()
+        return [(price, datetime.fromtimestamp(at)) for price, at in rows]
+
+    def query(
+            self,
+            params: Optional[FilterParams] = None,
+            limit: Optional[int] = None,
+            offset: int = 0,
+            **filters,
+    ) -> List[Tender]:
+        """
+        Поиск по FilterParams (диапазоны цены, площади, этажа и этажности,
+        типы объектов, районы и станции метро) с его сортировкой и по
+        условиям из EXTRA_FILTERS, например query(params, max_metro_distance=800).
+        Поля FilterParams, которые нельзя проверить по сохраненным тендерам,
+        вызывают ValueError. Страница из FilterParams не учитывается,
+        для этого есть limit и offset
+        """
+        conditions, values = [], []
+
+        if params is not None:
+            conditions, values = self.get_params_conditions(params)
+
+        for name, value in filters.items():
+            if name not in EXTRA_FILTERS:
+                raise ValueError(f'Неизвестный фильтр: {name}')
+            column, operator = EXTRA_FILTERS[name]
+            conditions.append(f'{column} {operator} ?')
+            values.append(to_sql_value(value))
+
+        sql = f'SELECT {", ".join(TENDER_FIELDS)} FROM tenders'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+
+        if params is not None and params.order_by in ORDER_FIELDS:
+            direction = 'ASC' if params.order_asc is not False else 'DESC'
+            sql += f' ORDER BY {ORDER_FIELDS[params.order_by]} {direction}'
+
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            values += [limit, offset]
+
+        with self._lock:
+            rows = self._conn.execute(sql, values).fetchall()
+
+        return [Tender.parse_obj(dict(zip(TENDER_FIELDS, row))) for row in rows]
+
+    def get_params_conditions(self, params: FilterParams) -> Tuple[List[str], list]:
+        unsupported = [
+            name for name, value in params.dict(exclude_none=True).items()
+            if value not in ('', [])
+            and name not in IGNORED_PARAMS
+            and name not in RANGE_FILTERS
+            and name not in LABEL_FILTERS
+        ]
+        if unsupported:
+            raise ValueError(
+                f'Фильтры не поддерживаются в TenderStore: {", ".join(unsupported)}'
+            )
+
+        conditions, values = [], []
+        for name, column in RANGE_FILTERS.items():
+            value: Optional[Range] = getattr(params, name)
+            if value is None:
+                continue
+            for bound, operator in ((value.min, '>='), (value.max, '<=')):
+                bound = parse_range_value(bound)
+                if bound is not None:
+                    conditions.append(f'{column} {operator} ?')
+                    values.append(bound)
+
+        for name, columns in LABEL_FILTERS.items():
+            codes = getattr(params, name)
+            if not codes:
+                continue
+            if self.filter_index is None:
+                raise ValueError(f'Для фильтра {name} нужен filter_index')
+
+            # Неизвестный код - UnknownFilterValueError
+            self.filter_index.validate(params)
+            alias = params.__fields__[name].alias
+            labels = [self.filter_index.get_label(alias, code) for code in codes]
+            placeholders = ', '.join('?' for _ in labels)
+            conditions.append('(' + ' OR '.join(
+                f'{column} IN ({placeholders})' for column in columns
+            ) + ')')
+            values.extend(labels * len(columns))
+
+        return conditions, values
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM tenders'
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,10 +1,24 @@
+import hashlib
+import json
+import random
+import re
 import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from enum import Enum
-from typing import Any
+from typing import Any, Optional, Union
+from urllib.parse import urlparse
 
 import requests
 
 from exceptions import TooManyRequestsError
+from utils.metrics import metrics as default_metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 ENCODING = 'utf-8'
 EXCEPTION_WORDS = (
@@ -19,6 +33,30 @@ EXCEPTION_WORDS = (
     'помещение',
     'комната',
 )
+EXCEPTION_WORDS_RE = re.compile(
+    '|'.join(re.escape(word.lower()) for word in EXCEPTION_WORDS)
+)
+# Полные названия -> сокращения для normalize_address
+ADDRESS_WORDS = {
+    'город': 'г',
+    'улица': 'ул',
+    'дом': 'д',
+    'корпус': 'к',
+    'корп': 'к',
+    'строение': 'с',
+    'стр': 'с',
+    'владение': 'вл',
+    'проспект': 'пр-кт',
+    'просп': 'пр-кт',
+    'переулок': 'пер',
+    'бульвар': 'б-р',
+    'шоссе': 'ш',
+    'площадь': 'пл',
+    'проезд': 'пр-д',
+    'набережная': 'наб',
+    'поселок': 'п',
+}
+ADDRESS_PUNCTUATION_RE = re.compile(r'[^\w\s/-]')
 CONVERSION_FACTORS = {
     'км': 1000,
     'м': 1,
@@ -36,61 +74,189 @@ SINGLE_FIELDS = (
 ERRORS_FOR_RETRY = (
     TooManyRequestsError,
     ConnectionError,
+    requests.ConnectionError,
 )
 MAX_RETRIES = 6
+THROTTLE_STATUS_CODES = (429, 503)
+FLATINFO_HOST = 'flatinfo.ru'
+
+
+def get_retry_delay(delay: float, error: Exception) -> float:
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        return retry_after
+    return delay * random.uniform(0.5, 1.5)
 
 
 def wait_for_response(func) -> Any:
-    def wrapper(*args, **kwargs) -> Any:
+    """
+    Повторяет запрос при 503/429 и ошибках соединения. Если передан
+    throttle (HostThrottle), каждая попытка занимает у него слот, а ответы
+    хоста подстраивают его лимиты
+    """
+
+    def wrapper(*args, throttle=None, **kwargs) -> Any:
         delay = 1
+        metrics = kwargs.get('metrics') or default_metrics
+        # args: method, decoder, url
+        endpoint = endpoint_name(args[2])
 
-        for _ in range(MAX_RETRIES):
+        for attempt in range(MAX_RETRIES + 1):
             try:
-                return func(*args, **kwargs)
-            except ERRORS_FOR_RETRY:
-                time.sleep(delay)
+                with throttle.slot() if throttle else nullcontext():
+                    res = func(*args, **kwargs)
+            except ERRORS_FOR_RETRY as e:
+                if throttle and isinstance(e, TooManyRequestsError):
+                    throttle.on_throttled(e.retry_after)
+                if attempt == MAX_RETRIES:
+                    metrics.inc(
+                        'http_failures_total',
+                        endpoint=endpoint,
+                        reason=type(e).__name__,
+                    )
+                    raise
+                metrics.inc(
+                    'http_retries_total',
+                    endpoint=endpoint,
+                    reason=type(e).__name__,
+                )
+                time.sleep(get_retry_delay(delay, e))
                 delay *= 2
+                continue
 
-        return func(*args, **kwargs)
+            if throttle:
+                throttle.on_success()
+            return res
 
     return wrapper
 
 
 class HTTPMethod(Enum):
-    GET = requests.get
-    POST = requests.post
+    GET = 'GET'
+    POST = 'POST'
+
+
+def json_loads(content: Union[str, bytes]) -> Any:
+    """
+    orjson, если установлен, иначе стандартный json
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
 
 
 class DecodeTo(Enum):
     TEXT: object = lambda res: res.text
-    JSON: object = lambda res: res.json()
+    JSON: object = lambda res: json_loads(res.content)
+    RESPONSE: object = lambda res: res
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+def get_validators(res: requests.Response) -> dict:
+    """
+    Данные для условного запроса: ETag, Last-Modified и хэш тела
+    на случай, если сервер не отдает ни того, ни другого
+    """
+    return {
+        'etag': res.headers.get('ETag'),
+        'last_modified': res.headers.get('Last-Modified'),
+        'hash': content_hash(res.content),
+    }
+
+
+def get_conditional_headers(validators: dict) -> dict:
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
 
 
 @wait_for_response
-def get_url(method, decoder, url, **kwargs):
-    res = method(url, **kwargs)
+def get_url(method, decoder, url, session=None, metrics=None, **kwargs):
+    metrics = metrics or default_metrics
+    endpoint = endpoint_name(url)
+    client = session if session is not None else requests
+
+    start = time.perf_counter()
+    res = client.request(method.value, url, **kwargs)
+    metrics.observe(
+        'http_request_seconds',
+        time.perf_counter() - start,
+        endpoint=endpoint,
+    )
+    metrics.inc(
+        'http_requests_total',
+        endpoint=endpoint,
+        status=res.status_code,
+    )
+    metrics.inc(
+        'http_response_bytes_total',
+        len(res.content),
+        endpoint=endpoint,
+    )
+
     res.encoding = ENCODING
-    check_status_code(res.status_code)
+    check_status_code(res.status_code, res.headers)
     return decoder(res)
 
 
-def check_status_code(status_code: int) -> None:
-    if status_code == 503:
-        raise TooManyRequestsError
+def endpoint_name(url: str) -> str:
+    parsed = urlparse(url)
+    name = parsed.path.rstrip('/').rsplit('/', 1)[-1]
+    if parsed.hostname == FLATINFO_HOST and name != 'adres_response.php':
+        return 'flatinfo_page'
+    return name
+
+
+def check_status_code(status_code: int, headers=None) -> None:
+    if status_code in THROTTLE_STATUS_CODES:
+        retry_after = parse_retry_after(headers or {})
+        raise TooManyRequestsError(retry_after)
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0)
 
 
 def clean_address(address):
     address_parts = address.split(',')
     clean_parts = [
-        part.strip() for part in address_parts if
-        not any(word.lower() in part.lower()
-                for word in EXCEPTION_WORDS)
+        part.strip() for part in address_parts
+        if not EXCEPTION_WORDS_RE.search(part.lower())
     ]
 
     clean_address = ', '.join(clean_parts)
     return clean_address
 
 
+def normalize_address(address: str) -> str:
+    """
+    Каноничный вид адреса для ключей кэша: разные написания одного дома
+    ('ул. Ленина, д. 5' и 'улица Ленина, дом 5') дают одну строку
+    """
+    address = clean_address(address.lower().replace('ё', 'е'))
+    words = ADDRESS_PUNCTUATION_RE.sub(' ', address).split()
+    return ' '.join(ADDRESS_WORDS.get(word, word) for word in words)
+
+
 def convert_to_meters(s: str) -> float:
     try:
         s = s.strip().lower().replace('.', '')
@@ -0,0 +1,154 @@
+import json
+import os
+from queue import Queue
+from threading import Event
+from typing import Callable, Iterable, List, Optional, Set
+
+from models.filter_models import FilterParams
+from models.models import Tender
+from logger import log
+
+
+class Watcher:
+    """
+    Следит за выдачей фильтра: опрашивает ее каждые interval секунд
+    с сортировкой, при которой новые тендеры идут первыми, и листает
+    страницы, пока на странице есть еще не виденные тендеры.
+    Новые тендеры передаются в callback и/или queue
+    """
+
+    def __init__(
+            self,
+            parser,
+            params: FilterParams,
+            callback: Optional[Callable[[Tender], None]] = None,
+            queue: Optional[Queue] = None,
+            seen_path: Optional[str] = 'seen_ids.json',
+            interval: float = 300,
+            order_by: str = 'RequestEndDate',
+            order_asc: bool = False,
+            max_pages: Optional[int] = None,
+    ):
+        """
+        parser - Parser, которым загружаются и обогащаются тендеры
+        seen_path - файл с виденными id, None - хранить только в памяти
+        order_by, order_asc - сортировка выдачи при опросе
+        max_pages - ограничение числа страниц за один опрос
+        """
+        self.parser = parser
+        self.params = parser.prepare_params(params.copy(
+            update={'order_by': order_by, 'order_asc': order_asc}
+        ))
+        self.callback = callback
+        self.queue = queue
+        self.seen_path = seen_path
+        self.interval = interval
+        self.max_pages = max_pages
+        self.seen_ids: Set[int] = self.load_seen()
+        self._stop = Event()
+
+    def load_seen(self) -> Set[int]:
+        if self.seen_path is None or not os.path.exists(self.seen_path):
+            return set()
+        with open(self.seen_path, encoding='utf-8') as f:
+            return set(json.load(f))
+
+    def save_seen(self) -> None:
+        if self.seen_path is None:
+            return
+        with open(f'{self.seen_path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(sorted(self.seen_ids), f)
+        os.replace(f'{self.seen_path}.tmp', self.seen_path)
+
+    def poll(self) -> List[Tender]:
+        """
+        Один опрос выдачи. Листание останавливается на первой странице
+        без новых тендеров
+        """
+        parser = self.parser
+        parser.reset_caches()
+        page, page_size = parser._get_first_page(self.params)
+        end_page_number = parser.get_end_page_number(
+            page['totalCount'],
+            page_size,
+        )
+
+        new_tenders = []
+        page_number = 1
+        while True:
+            cleaned_tenders = parser.clear_entities(page)
+            new_raw = [
+                tender for tender in cleaned_tenders
+                if tender.get('id') not in self.seen_ids
+            ]
+            if not new_raw:
+                break
+
+            new_tenders.extend(self.deliver(new_raw))
+            # Тендеры, не собранные из-за ошибки, остаются новыми
+            # и пробуются снова при следующем опросе
+            failed_ids = set(parser.failed_ids)
+            self.seen_ids.update(
+                tender.get('id') for tender in new_raw
+                if tender.get('id') not in failed_ids
+            )
+
+            if page_number + 1 >= end_page_number \
+                    or (self.max_pages and page_number >= self.max_pages):
+                break
+            page_number += 1
+            page = parser._get_page_data(
+                page_number,
+                page_size,
+                params=self.params,
+            )
+
+        self.save_seen()
+        parser.metrics.inc('watch_polls_total')
+        parser.metrics.inc('watch_new_tenders_total', len(new_tenders))
+        log.info(f'Опрос: страниц {page_number}, новых тендеров {len(new_tenders)}')
+        return new_tenders
+
+    def deliver(self, raw_tenders: list) -> Iterable[Tender]:
+        """
+        Собирает и передает тендеры. id тендеров, собрать которые
+        не удалось, остаются в parser.failed_ids
+        """
+        self.parser.failed_ids = []
+        with self.parser.create_pool() as pool:
+            tenders = [
+                tender
+                for tender in self.parser.construct_tenders(raw_tenders, pool)
+                if tender is not None
+            ]
+
+        for tender in tenders:
+            if self.callback is not None:
+                self.callback(tender)
+            if self.queue is not None:
+                self.queue.put(tender)
+        return tenders
+
+    def run(self, polls: Optional[int] = None) -> None:
+        """
+        Опрашивает выдачу до вызова stop или polls раз. Ошибка опроса
+        не останавливает наблюдение
+        """
+        count = 0
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except (Exception,) as e:
+                self.parser.metrics.inc(
+                    'watch_failures_total',
+                    reason=type(e).__name__,
+                )
+                log.error(f'Ошибка опроса: {e!r}')
+
+            count += 1
+            if polls is not None and count >= polls:
+                break
+            self._stop.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop.set()